@@ -0,0 +1,240 @@
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+
+# Limits are per worker process: divide the OpenAI account limits by the
+# number of gunicorn workers
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "8"))
+ADMISSION_REQUESTS_PER_MINUTE = float(os.getenv("ADMISSION_REQUESTS_PER_MINUTE", "120"))
+ADMISSION_TOKENS_PER_MINUTE = float(os.getenv("ADMISSION_TOKENS_PER_MINUTE", "40000"))
+# How long a request may wait for a slot before it is shed
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "5"))
+# Requests one user may have waiting at once; more are shed immediately
+ADMISSION_MAX_QUEUED_PER_USER = int(os.getenv("ADMISSION_MAX_QUEUED_PER_USER", "4"))
+
+
+class AdmissionRejected(Exception):
+    """The request could not be started in time and should be shed"""
+
+    def __init__(self, message, reason):
+        super().__init__(message)
+        self.reason = reason
+
+
+class TokenBucket:
+    """Refills continuously at `rate` per second up to `capacity`"""
+
+    def __init__(self, per_minute, burst_seconds=10):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` can be taken, 0 if it can be taken now"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ('user', 'cost', 'start_tag', 'admitted', 'cancelled', 'wake')
+
+    def __init__(self, user, cost, start_tag, wake=None):
+        self.user = user
+        self.cost = cost
+        self.start_tag = start_tag
+        self.admitted = False
+        self.cancelled = False
+        # Called once admitted; threads waiting on the condition don't need it
+        self.wake = wake
+
+
+class AdmissionController:
+    """Gatekeeper for outbound LLM calls.
+
+    At most `max_concurrency` calls run at once, and request and token
+    buckets keep the call rate under the OpenAI limits. Waiting requests
+    are served in start-time fair queueing order: each user's requests get
+    virtual start tags spaced by 1/weight, so a user with many queued
+    requests only gets their fair share while others are waiting. Requests
+    that cannot start within their wait limit raise AdmissionRejected.
+    """
+
+    def __init__(self, max_concurrency=ADMISSION_MAX_CONCURRENCY,
+                 requests_per_minute=ADMISSION_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=ADMISSION_TOKENS_PER_MINUTE,
+                 max_wait=ADMISSION_MAX_WAIT, max_queued_per_user=ADMISSION_MAX_QUEUED_PER_USER):
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.max_queued_per_user = max_queued_per_user
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._cond = threading.Condition()
+        self._queue = []  # heap of (start_tag, seq, waiter)
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._last_tag = {}  # user -> start tag of their latest request
+        self._queued = {}  # user -> waiting requests
+        self._running = 0
+        self.admitted = 0
+        self.shed = 0
+        self.total_wait = 0.0
+
+    def _dispatch(self):
+        """Admit waiters from the head of the queue while capacity allows.
+
+        Returns how long to sleep before a rate limit frees up, or None.
+        """
+        while self._queue and self._running < self.max_concurrency:
+            _, _, waiter = self._queue[0]
+            if waiter.cancelled:
+                heapq.heappop(self._queue)
+                continue
+            now = time.monotonic()
+            delay = max(self._requests.wait_time(1, now), self._tokens.wait_time(waiter.cost, now))
+            if delay:
+                return delay
+            heapq.heappop(self._queue)
+            self._requests.take(1)
+            self._tokens.take(waiter.cost)
+            self._virtual_time = max(self._virtual_time, waiter.start_tag)
+            self._running += 1
+            waiter.admitted = True
+            if waiter.wake is not None:
+                waiter.wake()
+            else:
+                self._cond.notify_all()
+        return None
+
+    def _finish_waiting(self, user):
+        self._queued[user] -= 1
+        if not self._queued[user]:
+            del self._queued[user]
+            # Nothing queued: the user rejoins at the current virtual time
+            if self._last_tag.get(user, 0.0) <= self._virtual_time:
+                self._last_tag.pop(user, None)
+
+    def _enqueue(self, user, tokens, weight, wake=None):
+        """Queue a waiter with its fair-queueing start tag; call with the lock held"""
+        if self._queued.get(user, 0) >= self.max_queued_per_user:
+            self.shed += 1
+            raise AdmissionRejected("Too many requests waiting for this user", "user_queue_full")
+        start_tag = max(self._virtual_time, self._last_tag.get(user, 0.0))
+        self._last_tag[user] = start_tag + 1.0 / weight
+        waiter = _Waiter(user, tokens, start_tag, wake)
+        heapq.heappush(self._queue, (start_tag, next(self._seq), waiter))
+        self._queued[user] = self._queued.get(user, 0) + 1
+        return waiter
+
+    def _give_up(self, waiter):
+        """Shed a waiter whose time ran out; call with the lock held"""
+        waiter.cancelled = True
+        self.shed += 1
+        # Let the next waiter have the capacity this one was blocking
+        self._dispatch()
+        return AdmissionRejected("No LLM capacity within the wait limit", "timeout")
+
+    def _releaser(self, start):
+        """Count an admission and return the callable that frees its slot; call with the lock held"""
+        self.admitted += 1
+        self.total_wait += time.monotonic() - start
+        released = []
+
+        def release():
+            if released:
+                return
+            released.append(True)
+            with self._cond:
+                self._running -= 1
+                self._dispatch()
+
+        return release
+
+    def acquire(self, user, tokens=1000, weight=1.0, max_wait=None):
+        """Wait for a slot; returns a release callable or raises AdmissionRejected.
+
+        `tokens` is the estimated prompt plus completion size of the call.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        start = time.monotonic()
+        deadline = start + max_wait
+        with self._cond:
+            waiter = self._enqueue(user, tokens, weight)
+            try:
+                while True:
+                    delay = self._dispatch()
+                    if waiter.admitted:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._give_up(waiter)
+                    self._cond.wait(min(remaining, delay) if delay else remaining)
+            finally:
+                self._finish_waiting(user)
+            return self._releaser(start)
+
+    async def acquire_async(self, user, tokens=1000, weight=1.0, max_wait=None):
+        """acquire() for coroutines: waits on the event loop instead of blocking a thread.
+
+        Async and thread waiters share one queue, so fairness and the rate
+        limits hold across both serving modes in a process.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        start = time.monotonic()
+        deadline = start + max_wait
+        loop = asyncio.get_running_loop()
+        admitted = asyncio.Event()
+        with self._cond:
+            waiter = self._enqueue(user, tokens, weight, lambda: loop.call_soon_threadsafe(admitted.set))
+        try:
+            while True:
+                with self._cond:
+                    delay = self._dispatch()
+                    if waiter.admitted:
+                        return self._releaser(start)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._give_up(waiter)
+                try:
+                    await asyncio.wait_for(admitted.wait(), min(remaining, delay) if delay else remaining)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            # The caller went away; hand back the slot if it was granted meanwhile
+            with self._cond:
+                waiter.cancelled = True
+                if waiter.admitted:
+                    self._running -= 1
+                    self._dispatch()
+            raise
+        finally:
+            with self._cond:
+                self._finish_waiting(user)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "running": self._running,
+                "waiting": sum(self._queued.values()),
+                "max_concurrency": self.max_concurrency,
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 1) if self.admitted else 0.0
+            }
+
+
+# Shared by every outbound chat and document call of this worker
+admission = AdmissionController()
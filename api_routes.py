@@ -1,24 +1,39 @@
-import hashlib
 import os
+import re
 import json
-from flask import request, jsonify
-from functools import lru_cache
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait, FIRST_COMPLETED
+from flask import request, jsonify, Response, session, stream_with_context
 import openai
 from dotenv import load_dotenv
 # Importing necessary modules from oother files
 from language_utils import translate_to_language
-from legal_data import legal_db, LEGAL_JARGON
+from legal_data import LEGAL_JARGON
 from user_management import (
     handle_login, handle_register, handle_logout, handle_get_user,
     handle_save_chat, handle_get_chat_history, handle_get_chat, handle_delete_chat
 )
-from openai_wrapper import get_openai_client
+from llm_client import get_llm_client, async_llm_stats, LLMError
+from response_cache import make_cache_key
+from persistent_cache import chat_cache, document_cache
+from semantic_cache import SemanticCache, QuestionVectorizer, SEMANTIC_IDF_MAX_QUESTIONS
+from single_flight import SingleFlight
+from kb_search import KB_SEARCH_THRESHOLD, KB_FALLBACK_THRESHOLD, KB_CORRECTED_THRESHOLD
+from kb_manager import KnowledgeBaseManager
+from faq_warmup import FAQ_PAGE_SIZE
+from conversation_store import session_conversation_id
+from conversation_summary import ConversationSummarizer, format_summary
+from model_router import ModelRouter
+from output_policy import output_policy, finish_answer, disclaimer_suffix
+from admission import admission, AdmissionRejected, ADMISSION_MAX_QUEUED_PER_USER
+from context_builder import ContextBuilder, count_tokens
 
 # Load environment variables
 load_dotenv()
 
-# Get OpenAI client
-client = get_openai_client()
+# Shared pooled OpenAI client
+llm = get_llm_client()
 # it is a System message for chat API that will be sent to openAI
 SYSTEM_MESSAGE = """
 You are a knowledgeable and trustworthy legal assistant trained in Indian laws, legal processes, and rights.
@@ -35,29 +50,75 @@ Capabilities:
 Guidelines & Conduct:
 - Refer only to existing Indian laws and publicly accessible legal information; do not create legal interpretations.
 - Clearly state when a topic requires professional legal counsel or is beyond your scope.
-- Always include the disclaimer: "I am an AI assistant and not a licensed legal advisor. Please consult a lawyer for serious or urgent matters."
+- Always end your answer with the disclaimer: "I am an AI assistant and not a licensed legal advisor. Please consult a lawyer for serious or urgent matters."
 - Ask follow-up questions if the user's query lacks clarity.
 - Keep responses concise and clear unless the user asks for more detail.
 """
 
+# Picks the fast or the strong model for each chat message
+router = ModelRouter()
 
-# Storage for replying next in the sequence
-@lru_cache(maxsize=100)
-def get_cached_response(question_hash, language):
-    return None  # Initial cache miss
+# Longest a chat request waits for OpenAI before answering from fallbacks
+CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", "20"))
+# Looser similarity accepted from the semantic cache when OpenAI can't answer in time
+SEMANTIC_FALLBACK_THRESHOLD = float(os.getenv("SEMANTIC_FALLBACK_THRESHOLD", "0.6"))
+# OpenAI calls run here, so a request can give up at its deadline while the
+# call carries on and its answer is cached for the next asker
+chat_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("CHAT_EXECUTOR_WORKERS", "32")), thread_name_prefix="chat"
+)
 
-# I shall match the user's question with my extremely efficient kawledge database
-def check_knowledge_base(user_message):
-    user_message_lower = user_message.lower()
-    
-    for qa_pair in legal_db["legal_qa_pairs"]:
-        keywords = qa_pair["question"].lower().split()
-        # Verify if the primary keywords from the knowledge base inquiry are present in the user's message
-        match_score = sum(1 for word in keywords if word in user_message_lower and len(word) > 3)
-        if match_score >= 2 or qa_pair["question"].lower() in user_message_lower:
-            return qa_pair["answer"]
-            
-    return None
+# Fits history into the prompt token budget
+context_builder = ContextBuilder()
+# Folds older turns into a running summary (CONVERSATION_MEMORY=summary)
+summarizer = ConversationSummarizer(llm)
+
+# Identical questions asked at the same time share one OpenAI call
+chat_flight = SingleFlight()
+# Answers being prepared on the chat executor, by cache key. A repeat of a
+# question already in flight waits on the same Future instead of taking a
+# worker of its own just to block on the first one.
+pending_answers = {}
+pending_answers_lock = threading.Lock()
+
+# I shall match the user's question with my extremely efficient kawledge database.
+# Returns the index of the best question-answer pair in `kb` (a KnowledgeBase from
+# kb_manager, the current one by default), or None if none is confident enough or
+# covers enough of the question's terms (KB_MIN_COVERAGE, KB_PARTIAL_THRESHOLD);
+# partial matches go to OpenAI instead.
+# A miss is retried once with misspelled words corrected ("consmer complant"),
+# and a match found that way must reach at least KB_CORRECTED_THRESHOLD.
+def check_knowledge_base(user_message, threshold=KB_SEARCH_THRESHOLD, kb=None):
+    kb = kb or kb_manager.current
+    kb_match = kb.index.best(user_message, threshold)
+    if kb_match is None:
+        corrected = kb.fuzzy.correct(user_message)
+        if corrected != user_message:
+            kb_match = kb.index.best(corrected, max(threshold, KB_CORRECTED_THRESHOLD))
+    return kb_match
+
+# Shown when OpenAI can't answer and no fallback is close enough
+BUSY_MESSAGE = (
+    "Nyaay Saathi couldn't prepare an answer to your question in time. "
+    "Please try again in a minute. For urgent help, contact the District Legal Services Authority "
+    "or call the national legal aid helpline 15100."
+)
+
+# Best answer we have without OpenAI: the closest knowledge-base answer by
+# keywords or by TF-IDF similarity, a cached answer to a similar question, or the busy message
+def fallback_answer(llm_request, simplify, language):
+    kb = kb_manager.current
+    kb_match = check_knowledge_base(llm_request["question"], KB_FALLBACK_THRESHOLD, kb)
+    if kb_match is None:
+        kb_match = kb.vectors.best(llm_request["question"])
+    if kb_match is not None:
+        return kb.faqs.answer(kb_match, simplify, language)
+    answer, _ = semantic_cache.lookup(
+        llm_request["question"], llm_request["semantic_variant"], threshold=SEMANTIC_FALLBACK_THRESHOLD
+    )
+    if answer is not None:
+        return answer
+    return format_response(BUSY_MESSAGE, simplify, language)
 
 # Simplify legal stuff into simple words for users to understnad and comprehend
 def simplify_legal_jargon(text):
@@ -66,105 +127,450 @@ def simplify_legal_jargon(text):
             text = text.replace(term, f"{term} ({explanation})")
     return text
 
+# Where a streamed answer can be cut without splitting a sentence
+SENTENCE_END = re.compile(r'[.!?:](?=\s)|\n')
+
+# Apply the user's simplify and language choices to an answer
+def format_response(text, simplify, language):
+    if simplify:
+        text = simplify_legal_jargon(text)
+    if language != 'English':
+        text = translate_to_language(text, language)
+    return text
+
+# Languages offered in the UI
+LANGUAGES = ['English', 'Hinglish', 'Hindi', 'Bengali', 'Tamil', 'Telugu', 'Marathi', 'Gujarati', 'Kannada']
+
+# The knowledge base with its BM25 index over the questions, TF-IDF vectors of whole
+# entries for fallbacks the keywords miss, and its first answers formatted for every
+# language and simplify choice. Rebuilt in the background when the JSON changes.
+kb_manager = KnowledgeBaseManager(LANGUAGES, format_response)
+
+# Near-duplicate question cache, IDF weights fitted on the first knowledge-base questions at startup
+semantic_cache = SemanticCache(QuestionVectorizer(
+    corpus=[qa_pair["question"] for qa_pair in kb_manager.current.qa_pairs[:SEMANTIC_IDF_MAX_QUESTIONS]]
+))
+
+# Conversation key of the current browser session
+def get_conversation_id():
+    return session_conversation_id(session)
+
+# Try the knowledge base and the caches, otherwise prepare an OpenAI request.
+# Returns (answer, llm_request) and exactly one of them is None.
+def prepare_chat(conversations, conversation_id, user_message, simplify, language):
+    # Add my user message to this session's conversation history
+    conversations.append(conversation_id, "user", user_message)
+    return prepare_answer(
+        conversation_id, user_message, simplify, language,
+        lambda: (conversations.recent(conversation_id), conversations.get_summary(conversation_id))
+    )
+
+# prepare_chat() for a question with no conversation around it
+def prepare_standalone(user, user_message, simplify, language):
+    return prepare_answer(
+        user, user_message, simplify, language,
+        lambda: ([{"role": "user", "content": user_message}], None)
+    )
+
+# Shared by prepare_chat and prepare_standalone; `context` returns the
+# (history ending with the question, summary) to send if OpenAI is needed
+def prepare_answer(user, user_message, simplify, language, context):
+    # Try to find a direct match in our knowledge base first
+    kb = kb_manager.current
+    kb_match = check_knowledge_base(user_message, kb=kb)
+    if kb_match is not None:
+        # Use our own knowledge base to avoid API call
+        return kb.faqs.answer(kb_match, simplify, language), None
+    
+    # System message, running summary and as much recent history as fits the token budget
+    history, summary = context()
+    messages, prompt_tokens = context_builder.build(
+        SYSTEM_MESSAGE, history, format_summary(summary) if summary else None
+    )
+    context = messages[1:-1]
+    route = router.route(user_message, len(context))
+    cache_key = make_cache_key(user_message, language, simplify, route.model, context)
+    
+    cached_response = chat_cache.get(cache_key)
+    
+    # A standalone question can reuse the answer to a differently worded one
+    standalone = not context
+    semantic_variant = (language, bool(simplify), route.model)
+    if cached_response is None and standalone:
+        cached_response, _ = semantic_cache.lookup(user_message, semantic_variant)
+    
+    if cached_response is not None:
+        return cached_response, None
+    
+    return None, {
+        "user": user,
+        "question": user_message,
+        "messages": messages,
+        "prompt_tokens": prompt_tokens,
+        "route": route,
+        "query_class": output_policy.classify(user_message, route, len(context)),
+        "cache_key": cache_key,
+        "standalone": standalone,
+        "semantic_variant": semantic_variant,
+        "deadline": time.monotonic() + CHAT_DEADLINE_SECONDS
+    }
+
+# Add Nyaay Saathi's answer to the session history, folding old turns if due
+def add_assistant_turn(conversations, conversation_id, answer):
+    conversations.append(conversation_id, "assistant", answer)
+    summarizer.maybe_summarize(conversations, conversation_id)
+
+# Cache a finished (simplified and translated) OpenAI answer. One cut off by
+# max_tokens is not cached: the budget grows after it, and later askers should
+# get the whole answer, not this one for the next 24 hours.
+def remember_answer(llm_request, answer):
+    if llm_request.get("truncated"):
+        print(f"Truncated {llm_request['query_class']} answer not cached")
+        return
+    chat_cache.set(llm_request["cache_key"], answer)
+    if llm_request["standalone"]:
+        semantic_cache.add(llm_request["question"], llm_request["semantic_variant"], answer)
+
+# Admission arguments for a chat request: never wait past its deadline
+def admission_args(llm_request, max_tokens):
+    return {
+        "tokens": llm_request["prompt_tokens"] + max_tokens,
+        "max_wait": max(0.0, min(admission.max_wait, llm_request["deadline"] - time.monotonic()))
+    }
+
+# Wait for an admission slot, but never past the request's deadline
+def admit(llm_request, max_tokens):
+    return admission.acquire(llm_request["user"], **admission_args(llm_request, max_tokens))
+
+# Feed a finished completion back to the router and output policy, return the answer text
+def finish_completion(llm_request, response):
+    router.record(llm_request["route"], response.latency, response.usage)
+    output_policy.record(
+        llm_request["query_class"],
+        response.usage.get("completion_tokens") or count_tokens(response.content),
+        response.finish_reason
+    )
+    llm_request["truncated"] = response.finish_reason == "length"
+    if not response.content.strip():
+        # A bare disclaimer is no answer; let the caller fall back
+        raise LLMError("Empty completion")
+    return finish_answer(response.content)
+
+# Ask the routed model for the whole answer at once, within the output budget of its query class
+def complete_chat(llm_request):
+    max_tokens, stop = output_policy.budget(llm_request["query_class"])
+    release = admit(llm_request, max_tokens)
+    try:
+        response = llm.chat_completion(
+            llm_request["messages"],
+            model=llm_request["route"].model,
+            temperature=0.3,
+            max_tokens=max_tokens,
+            stop=stop
+        )
+    finally:
+        release()
+    return finish_completion(llm_request, response)
+
+# Run the OpenAI request on the chat executor, shared with identical requests
+# in flight. The answer is simplified, translated and cached when it arrives,
+# even if the asker has given up on it by then.
+def start_answer(llm_request, simplify, language):
+    def answer_question():
+        answer = format_response(complete_chat(llm_request), simplify, language)
+        remember_answer(llm_request, answer)
+        return answer
+    
+    cache_key = llm_request["cache_key"]
+    with pending_answers_lock:
+        future = pending_answers.get(cache_key)
+        if future is not None:
+            return future
+        # chat_flight still coalesces with the other workers through its lock files
+        future = pending_answers[cache_key] = chat_executor.submit(
+            chat_flight.do, cache_key, answer_question, lambda: chat_cache.get(cache_key)
+        )
+    future.add_done_callback(lambda done: forget_pending_answer(cache_key, done))
+    return future
+
+def forget_pending_answer(cache_key, future):
+    with pending_answers_lock:
+        if pending_answers.get(cache_key) is future:
+            del pending_answers[cache_key]
+
+# Why an OpenAI answer failed, as reported with a fallback answer
+def degraded_reason(error):
+    if isinstance(error, AdmissionRejected):
+        return error.reason
+    print(f"Error: {str(error)}")
+    return "error"
+
+# Ask the routed model for the answer and yield text as the tokens arrive
+def stream_chat(llm_request):
+    query_class = llm_request["query_class"]
+    max_tokens, stop = output_policy.budget(query_class)
+    release = admit(llm_request, max_tokens)
+    start = time.monotonic()
+    tokens = []
+    try:
+        for token in llm.stream_chat_completion(
+            llm_request["messages"],
+            model=llm_request["route"].model,
+            temperature=0.3,
+            max_tokens=max_tokens,
+            stop=stop
+        ):
+            tokens.append(token)
+            yield token
+    finally:
+        release()
+    router.record(llm_request["route"], time.monotonic() - start)
+    text = "".join(tokens)
+    # The stream carries no usage, estimate it and assume a cut-off near the budget
+    completion_tokens = count_tokens(text)
+    llm_request["truncated"] = completion_tokens >= max_tokens * 0.95
+    output_policy.record(query_class, completion_tokens, "length" if llm_request["truncated"] else "stop")
+    if not text.strip():
+        raise LLMError("Empty completion")
+    yield disclaimer_suffix(text)
+
 # Manage API requests and handle them effociently
-def handle_chat_endpoint(conversation_history):
+def handle_chat_endpoint(conversations):
     data = request.json
     user_message = data.get('message', '')
     simplify = data.get('simplify', False)
     language = data.get('language', 'English')
     
-    # Add my user message to conversation history
-    conversation_history.append({"role": "user", "content": user_message})
+    conversation_id = get_conversation_id()
     
-    # Try to find a direct match in our knowledge base first
-    direct_answer = check_knowledge_base(user_message)
+    assistant_response, llm_request = prepare_chat(
+        conversations, conversation_id, user_message, simplify, language
+    )
     
-    if direct_answer:
-        # Use our own knowledge base to avoid API call
-        assistant_response = direct_answer
-    else:
+    if assistant_response is None:
+        future = start_answer(llm_request, simplify, language)
+        reason = None
+        try:
+            assistant_response = future.result(timeout=max(0.0, llm_request["deadline"] - time.monotonic()))
+        except FutureTimeoutError:
+            # Keeps running in the background and caches its answer when done
+            reason = "deadline"
+        except Exception as e:
+            reason = degraded_reason(e)
         
-        question_hash = hashlib.md5(user_message.encode()).hexdigest()
+        if reason:
+            print(f"Chat answered from fallback ({reason}) for {conversation_id}")
+            assistant_response = fallback_answer(llm_request, simplify, language)
+            add_assistant_turn(conversations, conversation_id, assistant_response)
+            return jsonify({"response": assistant_response, "degraded": True})
+    
+    # Add Nyaay Saathi's response to conversation history
+    add_assistant_turn(conversations, conversation_id, assistant_response)
+    
+    result = {"response": assistant_response}
+    if llm_request is not None:
+        result["prompt_tokens"] = llm_request["prompt_tokens"]
+    return jsonify(result)
+
+# Server-sent event carrying one JSON payload
+def sse_event(payload, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+# Same as /api/chat, but the answer is streamed as server-sent events:
+#   data: {"delta": "..."}                 one or more pieces of the answer
+#   data: {"done": true, "response": "..."} the complete answer (and prompt_tokens if OpenAI was
+#                                           asked, or degraded: true for a fallback answer)
+#   event: error / data: {"error": "..."}  if OpenAI fails after part of the answer was sent
+def handle_chat_stream_endpoint(conversations):
+    data = request.json
+    user_message = data.get('message', '')
+    simplify = data.get('simplify', False)
+    language = data.get('language', 'English')
+    
+    conversation_id = get_conversation_id()
+    
+    assistant_response, llm_request = prepare_chat(
+        conversations, conversation_id, user_message, simplify, language
+    )
+    
+    def generate():
+        if assistant_response is not None:
+            # Knowledge base or cache hit, nothing to wait for
+            add_assistant_turn(conversations, conversation_id, assistant_response)
+            yield sse_event({"delta": assistant_response})
+            yield sse_event({"done": True, "response": assistant_response})
+            return
         
-        cached_response = get_cached_response(question_hash, language)
+        pieces = []
+        pending = ""
+        try:
+            for token in stream_chat(llm_request):
+                pending += token
+                # Simplify and translate whole sentences only, so jargon and
+                # phrases are never split across two chunks
+                boundary = 0
+                for match in SENTENCE_END.finditer(pending):
+                    boundary = match.end()
+                if boundary:
+                    piece = format_response(pending[:boundary], simplify, language)
+                    pending = pending[boundary:]
+                    pieces.append(piece)
+                    yield sse_event({"delta": piece})
+            if pending:
+                piece = format_response(pending, simplify, language)
+                pieces.append(piece)
+                yield sse_event({"delta": piece})
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            if pieces or pending:
+                yield sse_event({"error": str(e)}, event="error")
+                return
+            # Nothing sent yet (shed, or OpenAI failed up front): answer from fallbacks instead
+            fallback = fallback_answer(llm_request, simplify, language)
+            add_assistant_turn(conversations, conversation_id, fallback)
+            yield sse_event({"delta": fallback})
+            yield sse_event({"done": True, "response": fallback, "degraded": True})
+            return
         
-        if cached_response:
-            assistant_response = cached_response
-        else:
-            try:
-                # Prepare messages for OpenAI API
-                messages = [
-                    {"role": "system", "content": SYSTEM_MESSAGE}
-                ]
-                
-                # Add conversation history (limit to last 5 messages for context length)
-                messages.extend(conversation_history[-5:])
+        final_response = "".join(pieces)
+        remember_answer(llm_request, final_response)
+        add_assistant_turn(conversations, conversation_id, final_response)
+        yield sse_event({"done": True, "response": final_response, "prompt_tokens": llm_request["prompt_tokens"]})
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Questions accepted in one /api/chat/batch request
+CHAT_BATCH_MAX_QUESTIONS = int(os.getenv("CHAT_BATCH_MAX_QUESTIONS", "50"))
+# Questions of one batch waiting for OpenAI at a time. Held below
+# ADMISSION_MAX_QUEUED_PER_USER, so a batch queues for admission instead of being
+# shed and leaves the user a place in the queue for their own chat.
+CHAT_BATCH_CONCURRENCY = max(1, min(
+    int(os.getenv("CHAT_BATCH_CONCURRENCY", "3")), ADMISSION_MAX_QUEUED_PER_USER - 1
+))
+
+# Answer a list of independent questions, streamed back as NDJSON in the order they finish:
+#   {"questions": ["...", {"message": "...", "language": "Hindi", "simplify": true, "id": "q7"}, ...],
+#    "language": "English", "simplify": false}           defaults for questions that don't set them
+# One line per question: {"index": 0, "id": "q7", "response": "..."} plus prompt_tokens if OpenAI
+# answered, degraded: true for a fallback answer, or {"index": 0, "error": "..."} for a bad question.
+# The questions share no history with each other or with the session's chat.
+def handle_chat_batch_endpoint():
+    data = request.get_json(silent=True) or {}
+    questions = data.get('questions')
+    if not isinstance(questions, list) or not questions:
+        return jsonify({"error": "questions must be a non-empty list"}), 400
+    if len(questions) > CHAT_BATCH_MAX_QUESTIONS:
+        return jsonify({"error": f"At most {CHAT_BATCH_MAX_QUESTIONS} questions per batch"}), 400
+    default_simplify = data.get('simplify', False)
+    default_language = data.get('language', 'English')
+    items = [{"message": q} if isinstance(q, str) else q if isinstance(q, dict) else {} for q in questions]
+    
+    user = get_conversation_id()
+    
+    def result_line(index, item, **fields):
+        line = {"index": index}
+        if "id" in item:
+            line["id"] = item["id"]
+        line.update(fields)
+        return json.dumps(line) + "\n"
+    
+    def generate():
+        pending = iter(enumerate(items))
+        # future -> [(index, item, llm_request, simplify, language)], more than
+        # one when the batch repeats a question already in flight
+        running = {}
+        exhausted = False
+        while True:
+            # Knowledge-base and cache hits are answered right away; OpenAI
+            # requests are started until CHAT_BATCH_CONCURRENCY are running
+            while not exhausted and len(running) < CHAT_BATCH_CONCURRENCY:
+                started = next(pending, None)
+                if started is None:
+                    exhausted = True
+                    break
+                index, item = started
+                message = item.get('message')
+                if not isinstance(message, str) or not message.strip():
+                    yield result_line(index, item, error="message is required")
+                    continue
+                simplify = item.get('simplify', default_simplify)
+                language = item.get('language', default_language)
+                answer, llm_request = prepare_standalone(user, message, simplify, language)
+                if answer is not None:
+                    yield result_line(index, item, response=answer)
+                    continue
+                running.setdefault(start_answer(llm_request, simplify, language), []).append(
+                    (index, item, llm_request, simplify, language)
+                )
             
-                # Check what type of client we have
-                if hasattr(client, 'chat') and hasattr(client.chat, 'completions'):
-                    # Official client, new style
-                    response = client.chat.completions.create(
-                        model="gpt-4",  
-                        messages=messages,
-                        temperature=0.3,
-                        max_tokens=1000  
-                    )
-                    assistant_response = response.choices[0].message.content
-                elif hasattr(client, 'chat_completions_create'):
-                    # Our wrapper
-                    response = client.chat_completions_create(
-                        model="gpt-4",
-                        messages=messages,
-                        temperature=0.3,
-                        max_tokens=1000
+            if not running:
+                return
+            earliest = min(entry[2]["deadline"] for entries in running.values() for entry in entries)
+            done, _ = wait(running, timeout=max(0.0, earliest - time.monotonic()), return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future in list(running):
+                waiting = []
+                for index, item, llm_request, simplify, language in running[future]:
+                    if future in done:
+                        if future.exception() is None:
+                            yield result_line(
+                                index, item, response=future.result(), prompt_tokens=llm_request["prompt_tokens"]
+                            )
+                            continue
+                        reason = degraded_reason(future.exception())
+                    elif llm_request["deadline"] <= now:
+                        # Keeps running in the background and caches its answer when done
+                        reason = "deadline"
+                    else:
+                        waiting.append((index, item, llm_request, simplify, language))
+                        continue
+                    print(f"Batch question answered from fallback ({reason}) for {user}")
+                    yield result_line(
+                        index, item, response=fallback_answer(llm_request, simplify, language), degraded=True
                     )
-                    assistant_response = response.choices[0].message.content
+                if waiting:
+                    running[future] = waiting
                 else:
-                    # Old style client
-                    response = client.ChatCompletion.create(
-                        model="gpt-4",
-                        messages=messages,
-                        temperature=0.3,
-                        max_tokens=1000
-                    )
-                    assistant_response = response.choices[0]["message"]["content"]
-                
-                # Cache the response
-                get_cached_response.cache_info()
-                get_cached_response.__wrapped__.__dict__[question_hash] = assistant_response
-                
-            except Exception as e:
-                print(f"Error: {str(e)}")
-                return jsonify({"error": str(e)}), 500
-    
-    # Simplify legal words for users
-    if simplify:
-        assistant_response = simplify_legal_jargon(assistant_response)
+                    del running[future]
     
-    # Translation
-    if language != 'English':
-        assistant_response = translate_to_language(assistant_response, language)
-    
-    # Add Nyaay Saathi's response to conversation history
-    conversation_history.append({"role": "assistant", "content": assistant_response})
-    
-    return jsonify({"response": assistant_response})
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 # Reset conversation history
-def handle_reset_conversation_endpoint(conversation_history):
-    conversation_history.clear()
+def handle_reset_conversation_endpoint(conversations):
+    conversations.reset(get_conversation_id())
     return jsonify({"status": "conversation reset"})
-# Handle FAQ 
+# Handle FAQ: /api/faqs?language=Hindi&simplify=true&offset=500&limit=100, English,
+# unsimplified and the first FAQ_PAGE_SIZE entries by default
 def handle_get_faqs():
-    # Get FAQs from the legal knowledge base
-    faqs = []
-    for qa_pair in legal_db["legal_qa_pairs"]:
-        faqs.append({
-            "question": qa_pair["question"],
-            "answer": qa_pair["answer"]
-        })
-    
-    return jsonify({"faqs": faqs})
+    language = request.args.get('language', 'English')
+    simplify = request.args.get('simplify', '').lower() in ('1', 'true', 'yes')
+    try:
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = max(int(request.args.get('limit', FAQ_PAGE_SIZE)), 1)
+    except ValueError:
+        offset, limit = 0, FAQ_PAGE_SIZE
+    # Get FAQs from the precomputed knowledge-base table
+    return Response(kb_manager.current.faqs.faqs_body(simplify, language, offset, limit), mimetype='application/json')
+
+
+# Knowledge-base search: /api/kb/search?q=...&k=5, best matches with their scores
+def handle_kb_search():
+    query = request.args.get('q', '')
+    try:
+        k = min(max(int(request.args.get('k', 5)), 1), 50)
+    except ValueError:
+        k = 5
+    kb = kb_manager.current
+    return jsonify({"kb_version": kb.version, "results": [
+        dict(hit.as_dict(), question=kb.qa_pairs[hit.index]["question"]) for hit in kb.index.search(query, k)
+    ]})
 
 
 def handle_simplify_text():
@@ -173,9 +579,35 @@ def handle_simplify_text():
     simplified = simplify_legal_jargon(text)
     return jsonify({"simplified": simplified})
 
+# Every response names the knowledge-base version that was serving
+def add_kb_version_header(response):
+    response.headers['X-KB-Version'] = kb_manager.current.version
+    return response
+
+def handle_get_metrics(conversations):
+    kb = kb_manager.current
+    return jsonify({
+        "conversations": conversations.stats(),
+        "response_cache": chat_cache.stats(),
+        "document_cache": document_cache.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "knowledge_base": kb_manager.stats(),
+        "faq_table": kb.faqs.stats(),
+        "kb_search": kb.index.stats(),
+        "kb_vectors": kb.vectors.stats(),
+        "kb_fuzzy": kb.fuzzy.stats(),
+        "context": context_builder.stats(),
+        "summaries": summarizer.stats(),
+        "routing": router.stats(),
+        "output_policy": output_policy.stats(),
+        "admission": admission.stats(),
+        "single_flight": dict(chat_flight.stats(), pending_answers=len(pending_answers)),
+        "llm": llm.stats(),
+        "llm_async": async_llm_stats()
+    })
+
 def handle_get_languages():
-    languages = ['English', 'Hinglish', 'Hindi', 'Bengali', 'Tamil', 'Telugu', 'Marathi', 'Gujarati', 'Kannada']
-    return jsonify({"languages": languages})
+    return jsonify({"languages": LANGUAGES})
 
 
 def handle_get_nearby_resources():
@@ -217,7 +649,7 @@ def delete_chat_endpoint(chat_id):
     return handle_delete_chat(chat_id)
 
 # Register all my  API routes
-def register_api_routes(app, conversation_history):
+def register_api_routes(app, conversations):
     # User management routes
     app.add_url_rule('/api/login', view_func=handle_login, methods=['POST'])
     app.add_url_rule('/api/register', view_func=handle_register, methods=['POST'])
@@ -232,18 +664,31 @@ def register_api_routes(app, conversation_history):
     app.add_url_rule('/api/chat/<chat_id>', view_func=get_chat_endpoint, methods=['GET'])
     app.add_url_rule('/api/chat/<chat_id>', view_func=delete_chat_endpoint, methods=['DELETE'])
     
+    def handle_get_metrics_with_history():
+        return handle_get_metrics(conversations)
+    
     def handle_chat_with_history():
-        return handle_chat_endpoint(conversation_history)
+        return handle_chat_endpoint(conversations)
+    
+    def handle_chat_stream_with_history():
+        return handle_chat_stream_endpoint(conversations)
     
     def handle_reset_with_history():
-        return handle_reset_conversation_endpoint(conversation_history)
+        return handle_reset_conversation_endpoint(conversations)
     
     # Chatbot routes 
     app.add_url_rule('/api/chat', view_func=handle_chat_with_history, methods=['POST'])
+    app.add_url_rule('/api/chat/stream', view_func=handle_chat_stream_with_history, methods=['POST'])
+    app.add_url_rule('/api/chat/batch', view_func=handle_chat_batch_endpoint, methods=['POST'])
     app.add_url_rule('/api/reset', view_func=handle_reset_with_history, methods=['POST'])
     app.add_url_rule('/api/simplify', view_func=handle_simplify_text, methods=['POST'])
     
     # Legal data routes
     app.add_url_rule('/api/faqs', view_func=handle_get_faqs, methods=['GET'])
+    app.add_url_rule('/api/kb/search', view_func=handle_kb_search, methods=['GET'])
     app.add_url_rule('/api/languages', view_func=handle_get_languages, methods=['GET'])
     app.add_url_rule('/api/nearby_resources', view_func=handle_get_nearby_resources, methods=['POST'])
+    
+    # Monitoring
+    app.add_url_rule('/api/metrics', view_func=handle_get_metrics_with_history, methods=['GET'])
+    app.after_request(add_kb_version_header)
@@ -0,0 +1,194 @@
+# asyncio serving mode: uvicorn asgi_app:app
+#
+# /api/chat and /api/upload-document run as coroutines on one event loop and
+# call OpenAI through the async client, so a waiting LLM call costs a socket
+# instead of a worker thread. Every other route is the Flask app from main.py,
+# mounted as WSGI and run on a thread pool; sessions, conversations, caches
+# and admission are shared with it.
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+import main
+from admission import admission
+from api_routes import (
+    prepare_chat, add_assistant_turn, remember_answer, fallback_answer, format_response,
+    admission_args, finish_completion, degraded_reason, kb_manager
+)
+from conversation_store import session_conversation_id
+from document_analysis import DocumentProcessor, validate_document
+from llm_client import get_async_llm_client, close_async_llm_client
+from output_policy import output_policy
+from single_flight import AsyncSingleFlight
+
+# Threads running the mounted Flask routes (login, history, streaming chat, ...)
+ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "32"))
+
+flask_app = main.app
+main.initialize_app()
+
+# Identical questions asked at the same time share one OpenAI call
+chat_flight = AsyncSingleFlight()
+
+SESSION_COOKIE = flask_app.config["SESSION_COOKIE_NAME"]
+session_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+
+
+# The Flask session of a request, read from its signed cookie
+def load_session(request):
+    cookie = request.cookies.get(SESSION_COOKIE)
+    if cookie:
+        try:
+            return dict(session_serializer.loads(
+                cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds())
+            ))
+        except BadSignature:
+            pass
+    return {}
+
+
+# Write the session cookie back if the request changed the session, and name the
+# knowledge-base version like the Flask routes do
+def save_session(response, session, original):
+    response.headers['X-KB-Version'] = kb_manager.current.version
+    if session == original:
+        return response
+    response.set_cookie(
+        SESSION_COOKIE,
+        session_serializer.dumps(session),
+        max_age=int(flask_app.permanent_session_lifetime.total_seconds()) if session.get("_permanent") else None,
+        path=flask_app.config["SESSION_COOKIE_PATH"] or "/",
+        domain=flask_app.config["SESSION_COOKIE_DOMAIN"] or None,
+        secure=flask_app.config["SESSION_COOKIE_SECURE"],
+        httponly=flask_app.config["SESSION_COOKIE_HTTPONLY"],
+        samesite=flask_app.config["SESSION_COOKIE_SAMESITE"]
+    )
+    return response
+
+
+# complete_chat() on the event loop
+async def complete_chat_async(llm_request):
+    max_tokens, stop = output_policy.budget(llm_request["query_class"])
+    release = await admission.acquire_async(llm_request["user"], **admission_args(llm_request, max_tokens))
+    try:
+        response = await get_async_llm_client().chat_completion(
+            llm_request["messages"],
+            model=llm_request["route"].model,
+            temperature=0.3,
+            max_tokens=max_tokens,
+            stop=stop
+        )
+    finally:
+        release()
+    return finish_completion(llm_request, response)
+
+
+# Same contract as api_routes.handle_chat_endpoint. The knowledge-base search,
+# the caches and the conversation store block, so they run on a thread and
+# the event loop only ever waits on OpenAI.
+async def chat_endpoint(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return JSONResponse({"error": "Request body must be a JSON object"}, status_code=400)
+    user_message = data.get('message', '')
+    simplify = data.get('simplify', False)
+    language = data.get('language', 'English')
+
+    session = load_session(request)
+    original = dict(session)
+    conversation_id = session_conversation_id(session)
+    conversations = main.conversations
+
+    assistant_response, llm_request = await asyncio.to_thread(
+        prepare_chat, conversations, conversation_id, user_message, simplify, language
+    )
+
+    if assistant_response is None:
+        async def answer_question():
+            # Simplify legal words and translate, then cache the final answer
+            answer = format_response(await complete_chat_async(llm_request), simplify, language)
+            await asyncio.to_thread(remember_answer, llm_request, answer)
+            return answer
+
+        task = chat_flight.task(llm_request["cache_key"], answer_question)
+        reason = None
+        try:
+            # Shielded: at the deadline the call keeps running and caches its answer when done
+            assistant_response = await asyncio.wait_for(
+                asyncio.shield(task), max(0.0, llm_request["deadline"] - time.monotonic())
+            )
+        except asyncio.TimeoutError:
+            reason = "deadline"
+        except Exception as e:
+            reason = degraded_reason(e)
+
+        if reason:
+            print(f"Chat answered from fallback ({reason}) for {conversation_id}")
+            assistant_response = await asyncio.to_thread(fallback_answer, llm_request, simplify, language)
+            await asyncio.to_thread(add_assistant_turn, conversations, conversation_id, assistant_response)
+            return save_session(
+                JSONResponse({"response": assistant_response, "degraded": True}), session, original
+            )
+
+    # Add Nyaay Saathi's response to conversation history
+    await asyncio.to_thread(add_assistant_turn, conversations, conversation_id, assistant_response)
+
+    result = {"response": assistant_response}
+    if llm_request is not None:
+        result["prompt_tokens"] = llm_request["prompt_tokens"]
+    return save_session(JSONResponse(result), session, original)
+
+
+# Same contract as document_analysis.handle_document_upload
+async def upload_document_endpoint(request):
+    content_length = int(request.headers.get("content-length") or 0)
+    if content_length > flask_app.config["MAX_CONTENT_LENGTH"]:
+        return JSONResponse({"success": False, "error": "File too large"}, status_code=413)
+
+    form = await request.form()
+    try:
+        file = form.get('document')
+        if file is None or isinstance(file, str):
+            return JSONResponse({"success": False, "error": "No document part in the request"}, status_code=400)
+
+        error = validate_document(file)
+        if error:
+            return JSONResponse({"success": False, "error": error}, status_code=400)
+
+        session = load_session(request)
+        original = dict(session)
+        try:
+            processor = DocumentProcessor(file.file, file.filename)
+            result = await processor.process_async(get_async_llm_client(), session_conversation_id(session))
+        except Exception as e:
+            print(f"Document processing error: {str(e)}")
+            return JSONResponse({"success": False, "error": "Failed to process document"}, status_code=500)
+        return save_session(JSONResponse(result), session, original)
+    finally:
+        await form.close()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await close_async_llm_client()
+
+
+app = Starlette(
+    routes=[
+        Route('/api/chat', chat_endpoint, methods=['POST']),
+        Route('/api/upload-document', upload_document_endpoint, methods=['POST']),
+        Mount('/', app=WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS))
+    ],
+    lifespan=lifespan
+)
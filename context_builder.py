@@ -0,0 +1,150 @@
+import math
+import os
+import re
+import threading
+
+# Prompt tokens allowed per chat request (system message + history + question)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# A single earlier turn longer than this is cut down before it is sent
+CONTEXT_MAX_TURN_TOKENS = int(os.getenv("CONTEXT_MAX_TURN_TOKENS", "600"))
+
+# Chat format overhead, as counted by OpenAI for the gpt-3.5/gpt-4 family
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+# Words, numbers, single punctuation marks and runs of whitespace, roughly the
+# way the BPE tokenizers split text before merging
+PRETOKEN = re.compile(r"[A-Za-z]+|[0-9]{1,3}|[^\sA-Za-z0-9]|\s+")
+
+TRIM_MARKER = "\n[... trimmed ...]\n"
+
+
+def _piece_tokens(piece):
+    if piece.isspace():
+        # Runs of whitespace mostly merge into the following word
+        return 1 if '\n' in piece else 0
+    if piece.isascii():
+        if piece.isalpha():
+            # Common English words are one token, long ones about 4 characters each
+            return max(1, math.ceil(len(piece) / 4))
+        return 1
+    # Devanagari and other non-Latin scripts cost roughly a token per character
+    return len(piece)
+
+
+def count_tokens(text):
+    """Estimated token count of a piece of text.
+
+    A local approximation of OpenAI's BPE tokenizer: no vocabulary download,
+    no network. Stored history turns carry their count (see
+    conversation_store.Message), so a turn is only counted once however many
+    requests resend it.
+    """
+    return sum(_piece_tokens(piece) for piece in PRETOKEN.findall(text))
+
+
+def count_message_tokens(messages):
+    """Estimated prompt tokens for a list of chat messages"""
+    return sum(TOKENS_PER_MESSAGE + count_tokens(m["content"]) for m in messages) + TOKENS_PER_REPLY
+
+
+def _prefix_within(text, max_tokens):
+    """Longest prefix of text that fits in max_tokens"""
+    used = 0
+    for match in PRETOKEN.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > max_tokens:
+            return text[:match.start()]
+    return text
+
+
+def truncate_to_tokens(text, max_tokens, tokens=None):
+    """Cut text down to about max_tokens, keeping its beginning and its end.
+
+    The start of a long message usually says what it is and the end what is
+    being asked, so the middle is what gets dropped. `tokens` is the text's
+    count if already known. Only about max_tokens worth of either end is
+    scanned, so long turns are cheap to cut.
+    """
+    if (count_tokens(text) if tokens is None else tokens) <= max_tokens:
+        return text
+    budget = max(0, max_tokens - count_tokens(TRIM_MARKER))
+    head = _prefix_within(text, budget * 2 // 3)
+    tail = _prefix_within(text[::-1], budget - count_tokens(head))[::-1]
+    return head.rstrip() + TRIM_MARKER + tail.lstrip()
+
+
+class ContextBuilder:
+    """Fits the system message, history and question into a token budget.
+
+    Turns are added newest first until the budget is spent, so the prompt
+    always ends with the latest question and older turns are the first to
+    go. Oversized turns are trimmed to `max_turn_tokens` instead of
+    crowding everything else out.
+    """
+
+    def __init__(self, budget=CONTEXT_TOKEN_BUDGET, max_turn_tokens=CONTEXT_MAX_TURN_TOKENS):
+        self.budget = budget
+        self.max_turn_tokens = max_turn_tokens
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.total_prompt_tokens = 0
+        self.max_prompt_tokens = 0
+        self.trimmed_turns = 0
+        self.dropped_turns = 0
+
+    def build(self, system_message, history, summary=None):
+        """Return (messages, prompt_tokens) for history ending with the new question.
+
+        History turns may carry a precomputed "tokens" count, which is used
+        instead of counting their content again.
+        `summary`, if given, is sent as a second system message standing in
+        for turns no longer in the history.
+        """
+        preamble = [{"role": "system", "content": system_message}]
+        if summary:
+            preamble.append({"role": "system", "content": summary})
+        remaining = self.budget - count_message_tokens(preamble)
+        selected = []
+        trimmed = 0
+
+        for position, turn in enumerate(reversed(history)):
+            content = turn["content"]
+            tokens = turn.get("tokens")
+            if tokens is None:
+                tokens = count_tokens(content)
+            if position == 0:
+                # The question itself is always sent, trimmed only if it alone is over budget
+                limit = max(remaining - TOKENS_PER_MESSAGE, 0)
+            else:
+                limit = self.max_turn_tokens
+            if tokens > limit:
+                content = truncate_to_tokens(content, limit, tokens)
+                tokens = count_tokens(content)
+                trimmed += 1
+            cost = TOKENS_PER_MESSAGE + tokens
+            if position and cost > remaining:
+                break
+            selected.append({"role": turn["role"], "content": content})
+            remaining -= cost
+
+        messages = preamble + selected[::-1]
+        prompt_tokens = count_message_tokens(messages)
+        with self._lock:
+            self.builds += 1
+            self.total_prompt_tokens += prompt_tokens
+            self.max_prompt_tokens = max(self.max_prompt_tokens, prompt_tokens)
+            self.trimmed_turns += trimmed
+            self.dropped_turns += len(history) - len(selected)
+        return messages, prompt_tokens
+
+    def stats(self):
+        with self._lock:
+            return {
+                "budget": self.budget,
+                "builds": self.builds,
+                "avg_prompt_tokens": round(self.total_prompt_tokens / self.builds, 1) if self.builds else 0.0,
+                "max_prompt_tokens": self.max_prompt_tokens,
+                "trimmed_turns": self.trimmed_turns,
+                "dropped_turns": self.dropped_turns
+            }
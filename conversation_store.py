@@ -0,0 +1,212 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from context_builder import count_tokens
+
+# Turns kept per conversation; older ones fall off the front
+CONVERSATION_MAX_MESSAGES = int(os.getenv("CONVERSATION_MAX_MESSAGES", "20"))
+# Conversations untouched for this long are dropped
+CONVERSATION_IDLE_SECONDS = float(os.getenv("CONVERSATION_IDLE_SECONDS", str(2 * 3600)))
+# Upper bound on message text held by a worker across all conversations
+CONVERSATION_MAX_CHARS = int(os.getenv("CONVERSATION_MAX_CHARS", str(16 * 1024 * 1024)))
+
+
+def session_conversation_id(session):
+    """Conversation key for a web session: the logged-in user, or an id kept
+    in the session cookie for anonymous visitors"""
+    if 'user_id' in session:
+        return session['user_id']
+    if 'conversation_id' not in session:
+        session['conversation_id'] = uuid.uuid4().hex
+    return session['conversation_id']
+
+
+class Message:
+    """One chat turn, with its token count worked out once when stored"""
+
+    __slots__ = ('role', 'content', 'tokens')
+
+    def __init__(self, role, content):
+        # Roles repeat endlessly, keep one copy of each string
+        self.role = sys.intern(role)
+        self.content = content
+        self.tokens = count_tokens(content)
+
+    def as_dict(self):
+        return {"role": self.role, "content": self.content}
+
+    def as_context_dict(self):
+        """The message dict plus its token count, for ContextBuilder.build"""
+        return {"role": self.role, "content": self.content, "tokens": self.tokens}
+
+
+class Conversation:
+    """Fixed-capacity ring buffer of the latest turns of one session, plus a
+    running summary of the turns folded out of it"""
+
+    __slots__ = ('messages', 'summary', 'chars', 'last_seen')
+
+    def __init__(self, max_messages):
+        self.messages = deque(maxlen=max_messages)
+        self.summary = None
+        self.chars = 0
+        self.last_seen = time.monotonic()
+
+    def append(self, message):
+        """Add a turn, returns the change in stored characters"""
+        dropped = 0
+        if len(self.messages) == self.messages.maxlen:
+            dropped = len(self.messages[0].content)
+        self.messages.append(message)
+        delta = len(message.content) - dropped
+        self.chars += delta
+        return delta
+
+    def pop_oldest(self):
+        """Drop the oldest turn, returns the change in stored characters"""
+        message = self.messages.popleft()
+        self.chars -= len(message.content)
+        return -len(message.content)
+
+
+class ConversationStore:
+    """Conversation history per session, bounded in every direction.
+
+    Each session keeps at most `max_messages` turns. Sessions are kept in
+    least-recently-active order, so idle ones are evicted from the front
+    in O(1) each, and when the total text held goes over `max_chars` the
+    least recently active sessions lose their oldest turns first.
+    """
+
+    def __init__(self, max_messages=CONVERSATION_MAX_MESSAGES, idle_seconds=CONVERSATION_IDLE_SECONDS,
+                 max_chars=CONVERSATION_MAX_CHARS):
+        self.max_messages = max_messages
+        self.idle_seconds = idle_seconds
+        self.max_chars = max_chars
+        self._conversations = OrderedDict()  # session id -> Conversation
+        self._chars = 0
+        self._lock = threading.Lock()
+        self.evicted_idle = 0
+        self.evicted_memory = 0
+
+    def _expire_idle(self, now):
+        while self._conversations:
+            session_id, conversation = next(iter(self._conversations.items()))
+            if now - conversation.last_seen < self.idle_seconds:
+                break
+            del self._conversations[session_id]
+            self._chars -= conversation.chars
+            self.evicted_idle += 1
+
+    def _enforce_memory_cap(self, keep):
+        # Trim the least recently active sessions first, never the one being written
+        while self._chars > self.max_chars and self._conversations:
+            session_id, conversation = next(iter(self._conversations.items()))
+            if session_id == keep:
+                if len(self._conversations) == 1:
+                    break
+                self._conversations.move_to_end(session_id)
+                continue
+            if conversation.messages:
+                self._chars += conversation.pop_oldest()
+            if not conversation.messages:
+                del self._conversations[session_id]
+                self._chars -= conversation.chars
+            self.evicted_memory += 1
+
+    def append(self, session_id, role, content):
+        message = Message(role, content)
+        now = time.monotonic()
+        with self._lock:
+            self._expire_idle(now)
+            conversation = self._conversations.get(session_id)
+            if conversation is None:
+                conversation = self._conversations[session_id] = Conversation(self.max_messages)
+            else:
+                self._conversations.move_to_end(session_id)
+            conversation.last_seen = now
+            self._chars += conversation.append(message)
+            self._enforce_memory_cap(session_id)
+
+    def recent(self, session_id, limit=None):
+        """The session's latest turns, oldest first, as OpenAI message dicts
+        carrying their token count"""
+        with self._lock:
+            conversation = self._conversations.get(session_id)
+            if conversation is None:
+                return []
+            messages = list(conversation.messages)
+        if limit is not None:
+            messages = messages[-limit:] if limit > 0 else []
+        return [message.as_context_dict() for message in messages]
+
+    def get_summary(self, session_id):
+        """Running summary of the session's earlier turns, or None"""
+        with self._lock:
+            conversation = self._conversations.get(session_id)
+            return conversation.summary if conversation is not None else None
+
+    def fold_candidates(self, session_id, keep_recent, min_batch):
+        """Turns ready to be folded into the summary.
+
+        Returns (token, summary, messages) when at least `min_batch` turns
+        are older than the `keep_recent` latest ones, otherwise None. The
+        token and messages are passed back to apply_summary.
+        """
+        with self._lock:
+            conversation = self._conversations.get(session_id)
+            if conversation is None:
+                return None
+            older = len(conversation.messages) - keep_recent
+            if older < min_batch:
+                return None
+            return conversation, conversation.summary, list(conversation.messages)[:older]
+
+    def apply_summary(self, session_id, token, summary, folded):
+        """Replace the `folded` turns with the new summary.
+
+        Does nothing if the session was reset or evicted in the meantime.
+        """
+        with self._lock:
+            conversation = self._conversations.get(session_id)
+            if conversation is not token:
+                return False
+            delta = len(summary) - len(conversation.summary or "")
+            conversation.summary = summary
+            conversation.chars += delta
+            # Some of the turns may already have fallen off the ring buffer
+            folded_ids = {id(message) for message in folded}
+            while conversation.messages and id(conversation.messages[0]) in folded_ids:
+                delta += conversation.pop_oldest()
+            self._chars += delta
+            return True
+
+    def reset(self, session_id):
+        with self._lock:
+            conversation = self._conversations.pop(session_id, None)
+            if conversation is not None:
+                self._chars -= conversation.chars
+
+    def clear(self):
+        with self._lock:
+            self._conversations.clear()
+            self._chars = 0
+
+    def __len__(self):
+        return len(self._conversations)
+
+    def stats(self):
+        with self._lock:
+            self._expire_idle(time.monotonic())
+            return {
+                "sessions": len(self._conversations),
+                "chars": self._chars,
+                "max_chars": self.max_chars,
+                "max_messages": self.max_messages,
+                "evicted_idle": self.evicted_idle,
+                "evicted_memory": self.evicted_memory
+            }
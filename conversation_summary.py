@@ -0,0 +1,117 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import admission
+from context_builder import count_tokens
+
+# "window" sends only the latest turns; "summary" also folds older turns
+# into a running summary that is sent in their place
+CONVERSATION_MEMORY = os.getenv("CONVERSATION_MEMORY", "window").lower()
+# Latest turns always sent verbatim
+SUMMARY_KEEP_RECENT = int(os.getenv("SUMMARY_KEEP_RECENT", "6"))
+# Fold once at least this many turns are older than those
+SUMMARY_MIN_BATCH = int(os.getenv("SUMMARY_MIN_BATCH", "4"))
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gpt-3.5-turbo")
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "300"))
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "2"))
+# Summaries queue for OpenAI as one low-priority admission user: their
+# fair-queueing weight, and how long one may wait (it runs in the background)
+SUMMARY_ADMISSION_WEIGHT = float(os.getenv("SUMMARY_ADMISSION_WEIGHT", "0.25"))
+SUMMARY_ADMISSION_WAIT = float(os.getenv("SUMMARY_ADMISSION_WAIT", "30"))
+
+SUMMARY_INSTRUCTIONS = """
+You maintain a running summary of a conversation between a user and an Indian legal assistant.
+Merge the new turns into the existing summary. Keep every fact the user shared (names, dates,
+amounts, places, documents), what they asked and the guidance already given. Drop greetings and
+repetition. Write at most 150 words in the language of the conversation.
+"""
+
+
+def format_summary(summary):
+    """Text of the system message that stands in for the folded turns"""
+    return f"Summary of the earlier conversation:\n{summary}"
+
+
+class ConversationSummarizer:
+    """Folds older turns of long conversations into a running summary.
+
+    Summaries are written off the request path on a small thread pool, at
+    most one job per session at a time, and kept in the conversation store
+    so each turn is summarized once rather than on every request. Their
+    OpenAI calls go through admission like chat calls, all as one
+    low-weight user, so they only use capacity chats leave over.
+    """
+
+    def __init__(self, llm, model=SUMMARY_MODEL, enabled=CONVERSATION_MEMORY == "summary",
+                 keep_recent=SUMMARY_KEEP_RECENT, min_batch=SUMMARY_MIN_BATCH, workers=SUMMARY_WORKERS):
+        self.llm = llm
+        self.model = model
+        self.enabled = enabled
+        self.keep_recent = keep_recent
+        self.min_batch = min_batch
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="summarizer")
+        self._running = set()
+        self._lock = threading.Lock()
+        self.summaries = 0
+        self.folded_turns = 0
+        self.failures = 0
+
+    def maybe_summarize(self, conversations, session_id):
+        """Schedule a fold for this session if it has enough old turns"""
+        if not self.enabled:
+            return
+        candidates = conversations.fold_candidates(session_id, self.keep_recent, self.min_batch)
+        if candidates is None:
+            return
+        with self._lock:
+            if session_id in self._running:
+                return
+            self._running.add(session_id)
+        self._executor.submit(self._summarize, conversations, session_id, *candidates)
+
+    def _summarize(self, conversations, session_id, token, previous, messages):
+        try:
+            transcript = "\n".join(f"{m.role}: {m.content}" for m in messages)
+            prompt = f"Existing summary:\n{previous or '(none)'}\n\nNew turns:\n{transcript}"
+            # AdmissionRejected lands in the except below, and the turns are retried later
+            release = admission.acquire(
+                "summarizer",
+                tokens=count_tokens(SUMMARY_INSTRUCTIONS) + count_tokens(prompt) + SUMMARY_MAX_TOKENS,
+                weight=SUMMARY_ADMISSION_WEIGHT,
+                max_wait=SUMMARY_ADMISSION_WAIT
+            )
+            try:
+                summary = self.llm.chat_completion(
+                    [
+                        {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                        {"role": "user", "content": prompt}
+                    ],
+                    model=self.model,
+                    temperature=0.2,
+                    max_tokens=SUMMARY_MAX_TOKENS
+                ).content.strip()
+            finally:
+                release()
+            if summary and conversations.apply_summary(session_id, token, summary, messages):
+                with self._lock:
+                    self.summaries += 1
+                    self.folded_turns += len(messages)
+        except Exception as e:
+            # The turns stay in the history and are retried after the next answer
+            with self._lock:
+                self.failures += 1
+            print(f"Conversation summary error: {str(e)}")
+        finally:
+            with self._lock:
+                self._running.discard(session_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": "summary" if self.enabled else "window",
+                "summaries": self.summaries,
+                "folded_turns": self.folded_turns,
+                "failures": self.failures,
+                "running": len(self._running)
+            }
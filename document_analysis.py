@@ -1,18 +1,29 @@
+import asyncio
 import os
 import re
+import json
+import hashlib
 import tempfile
-from flask import request, jsonify
+from flask import request, jsonify, session
 import PyPDF2
 import docx
 import openai
 from dotenv import load_dotenv
-from openai_wrapper import get_openai_client
+from llm_client import get_llm_client
+from persistent_cache import document_cache
+from output_policy import output_policy
+from admission import admission
+from conversation_store import session_conversation_id
 
 # Load environment variables
 load_dotenv()
 
-# Get OpenAI client
-client = get_openai_client()
+# Shared pooled OpenAI client
+llm = get_llm_client()
+
+# Model used for document analysis
+DOCUMENT_MODEL = "gpt-4-1106-preview"
+
 class DocumentProcessor:
     """Process uploaded legal documents and extract relevant information"""
     
@@ -45,6 +56,23 @@ class DocumentProcessor:
                 "error": "Failed to extract text from document"
             }
     
+    async def process_async(self, llm_async, user):
+        """process() for the ASGI app: extraction runs on a thread, the LLM call on the event loop"""
+        if await asyncio.to_thread(self._extract_text):
+            await self._analyze_content_async(llm_async, user)
+            return {
+                "success": True,
+                "summary": self.summary,
+                "key_points": self.key_points,
+                "word_count": len(self.text_content.split()),
+                "document_type": self._get_document_type()
+            }
+        else:
+            return {
+                "success": False,
+                "error": "Failed to extract text from document"
+            }
+    
     def _extract_text(self):
         """Extract text from document based on file type"""
         try:
@@ -109,78 +137,145 @@ class DocumentProcessor:
         text = ''.join(char for char in text if char.isprintable() or char in ['\n', '\t'])
         return text.strip()
     
-    def _analyze_content(self):
-        """Generate summary and key points from document content"""
+    def _analysis_request(self):
+        """Return (cache_key, messages, max_tokens, estimated tokens) for the analysis call.
+        
+        Returns None instead if the same document was analysed before (by
+        any worker), with the cached summary and key points already set.
+        """
+        # Limit content length for  the  API call
+        content_for_analysis = self.text_content[:15000]  # Limiting to first 15000 chars
+        
+        doc_type = self._get_document_type()
+        
+        # Same document analysed before (by any worker)?
+        cache_key = hashlib.sha256(
+            f"{DOCUMENT_MODEL}\x1f{doc_type}\x1f{content_for_analysis}".encode('utf-8')
+        ).hexdigest()
+        cached = document_cache.get(cache_key)
+        if cached is not None:
+            cached = json.loads(cached)
+            self.summary = cached["summary"]
+            self.key_points = cached["key_points"]
+            return None
+        
+        # Create prompt based on document type
+        prompt = f"""You're a legal assistant analyzing a {doc_type}. 
+        Please provide:
+        1. A concise summary (3-4 sentences) explaining what this document is about
+        2. Key points that a layperson should understand (bullet points)
+        3. Any obligations, rights, or deadlines mentioned
+        4. Explain any complex legal terminology in simple terms
+        
+        Format your response as JSON with these keys: "summary", "key_points", "obligations_and_rights", "terminology_explained"
+        
+        Here's the document text:
+        {content_for_analysis}
+        """
+        
+        max_tokens, _ = output_policy.budget("document_summary")
+        messages = [
+            {"role": "system", "content": "You are a legal assistant that specializes in explaining legal documents in simple terms."},
+            {"role": "user", "content": prompt}
+        ]
+        return cache_key, messages, max_tokens, len(content_for_analysis) // 4 + max_tokens
+    
+    def _apply_analysis(self, cache_key, response):
+        """Take the summary and key points from the model's JSON answer"""
+        output_policy.record(
+            "document_summary", response.usage.get("completion_tokens", 0), response.finish_reason
+        )
+        
+        # Extract and process the response
+        analysis = response.content
+        
         try:
-            # Limit content length for  the  API call
-            content_for_analysis = self.text_content[:15000]  # Limiting to first 15000 chars
-            
-            doc_type = self._get_document_type()
-            
-            # Create prompt based on document type
-            prompt = f"""You're a legal assistant analyzing a {doc_type}. 
-            Please provide:
-            1. A concise summary (3-4 sentences) explaining what this document is about
-            2. Key points that a layperson should understand (bullet points)
-            3. Any obligations, rights, or deadlines mentioned
-            4. Explain any complex legal terminology in simple terms
+            analysis_json = json.loads(analysis)
+            self.summary = analysis_json.get("summary", "Summary not available")
             
-            Format your response as JSON with these keys: "summary", "key_points", "obligations_and_rights", "terminology_explained"
+            # Combine key points, obligations and terminology
+            self.key_points = analysis_json.get("key_points", [])
             
-            Here's the document text:
-            {content_for_analysis}
-            """
+            # Add obligations and rights as key points if available
+            if "obligations_and_rights" in analysis_json:
+                if isinstance(analysis_json["obligations_and_rights"], list):
+                    self.key_points.extend(analysis_json["obligations_and_rights"])
+                else:
+                    self.key_points.append(analysis_json["obligations_and_rights"])
             
-            # Call OpenAI API to analyze the document
-            response = client.chat.completions.create(
-                model="gpt-4-1106-preview",
-                response_format={"type": "json_object"},
-                messages=[
-                    {"role": "system", "content": "You are a legal assistant that specializes in explaining legal documents in simple terms."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.5,
-                max_tokens=1000
-            )
+            # Add explained terminology as key points if available
+            if "terminology_explained" in analysis_json:
+                if isinstance(analysis_json["terminology_explained"], dict):
+                    for term, explanation in analysis_json["terminology_explained"].items():
+                        self.key_points.append(f"{term}: {explanation}")
+                elif isinstance(analysis_json["terminology_explained"], list):
+                    self.key_points.extend(analysis_json["terminology_explained"])
+                else:
+                    self.key_points.append(analysis_json["terminology_explained"])
             
-            # Extract and process the response
-            analysis = response.choices[0].message.content
+            document_cache.set(cache_key, json.dumps({
+                "summary": self.summary,
+                "key_points": self.key_points
+            }))
+                    
+        except json.JSONDecodeError:
+            # Fallback if response isn't valid JSON
+            self.summary = "The document appears to be a legal text. Due to its complexity, I can only provide a basic analysis."
+            self.key_points = ["Please review the document carefully", "Consider consulting a lawyer for detailed understanding"]
+    
+    def _analysis_failed(self, error):
+        print(f"Error analyzing content: {str(error)}")
+        self.summary = "Unable to analyze document content"
+        self.key_points = ["Error processing document"]
+    
+    def _analyze_content(self):
+        """Generate summary and key points from document content"""
+        try:
+            analysis_request = self._analysis_request()
+            if analysis_request is None:
+                return
+            cache_key, messages, max_tokens, tokens = analysis_request
             
+            # Wait for a fair share of the LLM capacity; being shed raises and
+            # ends up in the "unable to analyze" fallback below
+            release = admission.acquire(session_conversation_id(session), tokens=tokens)
+            try:
+                # Call OpenAI API to analyze the document
+                response = llm.chat_completion(
+                    messages,
+                    model=DOCUMENT_MODEL,
+                    response_format={"type": "json_object"},
+                    temperature=0.5,
+                    max_tokens=max_tokens
+                )
+            finally:
+                release()
+            self._apply_analysis(cache_key, response)
+        except Exception as e:
+            self._analysis_failed(e)
+    
+    async def _analyze_content_async(self, llm_async, user):
+        """_analyze_content() with the async LLM client; the cache reads and writes run on a thread"""
+        try:
+            analysis_request = await asyncio.to_thread(self._analysis_request)
+            if analysis_request is None:
+                return
+            cache_key, messages, max_tokens, tokens = analysis_request
             
-            import json
+            release = await admission.acquire_async(user, tokens=tokens)
             try:
-                analysis_json = json.loads(analysis)
-                self.summary = analysis_json.get("summary", "Summary not available")
-                
-                # Combine key points, obligations and terminology
-                self.key_points = analysis_json.get("key_points", [])
-                
-                # Add obligations and rights as key points if available
-                if "obligations_and_rights" in analysis_json:
-                    if isinstance(analysis_json["obligations_and_rights"], list):
-                        self.key_points.extend(analysis_json["obligations_and_rights"])
-                    else:
-                        self.key_points.append(analysis_json["obligations_and_rights"])
-                
-                # Add explained terminology as key points if available
-                if "terminology_explained" in analysis_json:
-                    if isinstance(analysis_json["terminology_explained"], dict):
-                        for term, explanation in analysis_json["terminology_explained"].items():
-                            self.key_points.append(f"{term}: {explanation}")
-                    elif isinstance(analysis_json["terminology_explained"], list):
-                        self.key_points.extend(analysis_json["terminology_explained"])
-                    else:
-                        self.key_points.append(analysis_json["terminology_explained"])
-                        
-            except json.JSONDecodeError:
-                # Fallback if response isn't valid JSON
-                self.summary = "The document appears to be a legal text. Due to its complexity, I can only provide a basic analysis."
-                self.key_points = ["Please review the document carefully", "Consider consulting a lawyer for detailed understanding"]
-                
+                response = await llm_async.chat_completion(
+                    messages,
+                    model=DOCUMENT_MODEL,
+                    response_format={"type": "json_object"},
+                    temperature=0.5,
+                    max_tokens=max_tokens
+                )
+            finally:
+                release()
+            await asyncio.to_thread(self._apply_analysis, cache_key, response)
         except Exception as e:
-            print(f"Error analyzing content: {str(e)}")
-            self.summary = "Unable to analyze document content"
-            self.key_points = ["Error processing document"]
+            self._analysis_failed(e)
     
     def _get_document_type(self):
         """Identify the type of legal document based on content and filename"""
@@ -214,6 +309,20 @@ class DocumentProcessor:
             return "Legal Document"
 
 
+# Check an uploaded file; returns an error message or None if it can be processed
+def validate_document(file):
+    if file.filename == '':
+        return "No file selected"
+    
+    # Check the  file extensions
+    allowed_extensions = {'.pdf', '.docx', '.doc', '.txt'}
+    file_ext = os.path.splitext(file.filename)[1].lower()
+    
+    if file_ext not in allowed_extensions:
+        return f"File type not supported. Please upload a PDF, Word document, or text file"
+    return None
+
+
 def handle_document_upload():
     """Process uploaded legal document and return analysis"""
     if 'document' not in request.files:
@@ -224,20 +333,11 @@ def handle_document_upload():
     
     file = request.files['document']
     
-    if file.filename == '':
-        return jsonify({
-            "success": False,
-            "error": "No file selected"
-        }), 400
-    
-    # Check the  file extensions
-    allowed_extensions = {'.pdf', '.docx', '.doc', '.txt'}
-    file_ext = os.path.splitext(file.filename)[1].lower()
-    
-    if file_ext not in allowed_extensions:
+    error = validate_document(file)
+    if error:
         return jsonify({
             "success": False,
-            "error": f"File type not supported. Please upload a PDF, Word document, or text file"
+            "error": error
         }), 400
     
     # Process mydoc
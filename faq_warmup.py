@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+
+from language_utils import LANGUAGE_TRANSLATIONS
+from legal_data import LEGAL_JARGON
+
+# Precomputed answers are shared by the workers of a deploy through this file.
+# Empty to compute in every process (still shared by gunicorn --preload).
+FAQ_SNAPSHOT_PATH = os.getenv("FAQ_SNAPSHOT_PATH", "/tmp/nyaay_faq_snapshot.json")
+# Entries (from the start of the knowledge base) formatted ahead of time; the
+# rest are formatted when asked for, so a large knowledge base loads quickly
+FAQ_TABLE_MAX_ENTRIES = int(os.getenv("FAQ_TABLE_MAX_ENTRIES", "500"))
+# Most FAQs in one /api/faqs response, later ones are paged through with ?offset=
+FAQ_PAGE_SIZE = int(os.getenv("FAQ_PAGE_SIZE", "500"))
+
+
+def faq_fingerprint(qa_pairs, languages):
+    """Hash of everything the precomputed answers depend on"""
+    source = json.dumps(
+        [list(qa_pairs), languages, LEGAL_JARGON, LANGUAGE_TRANSLATIONS], sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+class FaqTable:
+    """Knowledge-base answers in every language and simplify variant.
+
+    Built once at startup and never changed: answers are tuples indexed like
+    the knowledge base and the variant map is read-only, so request threads
+    read it without locking. The table holds the first entries of the
+    knowledge base (`answers` may be shorter than `qa_pairs`); later
+    entries and variants outside the table (a language not offered in the
+    UI) are formatted on demand. /api/faqs is served a page at a time; the
+    first page of each variant is serialized up front when the table holds it.
+    """
+
+    def __init__(self, qa_pairs, answers, format_response, source, page_size=FAQ_PAGE_SIZE):
+        # Read an entry at a time, so a mapped knowledge base stays on disk
+        self._qa_pairs = qa_pairs
+        self._answers = MappingProxyType({variant: tuple(texts) for variant, texts in answers.items()})
+        self.entries = min((len(texts) for texts in self._answers.values()), default=0)
+        self.page_size = page_size
+        first_page = min(page_size, len(qa_pairs))
+        self._faq_bodies = MappingProxyType({
+            variant: self._page_body(0, texts[:first_page]) for variant, texts in self._answers.items()
+        } if first_page <= self.entries else {})
+        self._format_response = format_response
+        self.source = source
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def answer(self, index, simplify, language):
+        """Answer `index` of the knowledge base, simplified and translated as asked"""
+        answers = self._answers.get((language, bool(simplify)))
+        hit = answers is not None and index < len(answers)
+        self._count(hit)
+        if not hit:
+            return self._format_response(self._qa_pairs[index]["answer"], simplify, language)
+        return answers[index]
+
+    def _page_body(self, offset, answers):
+        return json.dumps({
+            "faqs": [
+                {"question": self._qa_pairs[offset + i]["question"], "answer": answer}
+                for i, answer in enumerate(answers)
+            ],
+            "offset": offset,
+            "total": len(self._qa_pairs)
+        })
+
+    def faqs_body(self, simplify, language, offset=0, limit=None):
+        """JSON body of one /api/faqs page for this variant: at most `limit`
+        FAQs (page_size, the most allowed, by default) from `offset` on"""
+        limit = self.page_size if limit is None else min(limit, self.page_size)
+        body = None
+        if offset == 0 and limit == self.page_size:
+            body = self._faq_bodies.get((language, bool(simplify)))
+        self._count(body is not None)
+        if body is None:
+            end = min(offset + limit, len(self._qa_pairs))
+            body = self._page_body(offset, [self.answer(index, simplify, language) for index in range(offset, end)])
+        return body
+
+    def stats(self):
+        with self._lock:
+            return {
+                "answers": len(self._qa_pairs),
+                "precomputed": self.entries,
+                "variants": len(self._answers),
+                "source": self.source,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+def _load_snapshot(path, fingerprint):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"FAQ snapshot unreadable ({path}): {str(e)}")
+        return None
+    if snapshot.get("fingerprint") != fingerprint:
+        return None
+    return {(variant["language"], variant["simplify"]): variant["answers"] for variant in snapshot["variants"]}
+
+
+def _save_snapshot(path, fingerprint, answers):
+    snapshot = {
+        "fingerprint": fingerprint,
+        "variants": [
+            {"language": language, "simplify": simplify, "answers": texts}
+            for (language, simplify), texts in answers.items()
+        ]
+    }
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        # Readers see the old file or the new one, never half of one
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"FAQ snapshot not saved ({path}): {str(e)}")
+
+
+def build_faq_table(qa_pairs, languages, format_response, snapshot_path=FAQ_SNAPSHOT_PATH,
+                    max_entries=FAQ_TABLE_MAX_ENTRIES):
+    """Warm up: the first `max_entries` knowledge-base answers in every language, with and without simplification.
+
+    Uses the snapshot file if it was written for the same entries, jargon
+    and translations, otherwise computes the table and writes it.
+    """
+    start = time.perf_counter()
+    table_pairs = qa_pairs[:max_entries]
+    fingerprint = faq_fingerprint(table_pairs, languages)
+    answers = _load_snapshot(snapshot_path, fingerprint) if snapshot_path else None
+    source = "snapshot"
+    if answers is None:
+        source = "computed"
+        answers = {
+            (language, simplify): [format_response(qa_pair["answer"], simplify, language) for qa_pair in table_pairs]
+            for language in languages
+            for simplify in (False, True)
+        }
+        if snapshot_path:
+            _save_snapshot(snapshot_path, fingerprint, answers)
+    table = FaqTable(qa_pairs, answers, format_response, source)
+    print(f"FAQ table {source}: {len(table_pairs)} of {len(qa_pairs)} answers x {len(answers)} variants "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return table
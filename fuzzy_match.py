@@ -0,0 +1,165 @@
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from language_utils import COMMON_WORDS, QUERY_STOPWORDS, QUERY_SYNONYMS
+from legal_data import LEGAL_JARGON
+
+# Words shorter than this are never corrected ("fire" is not a typo of "fir")
+FUZZY_MIN_LENGTH = int(os.getenv("FUZZY_MIN_LENGTH", "5"))
+# Words this long may be two edits away from their correction, shorter ones one
+FUZZY_LONG_WORD = int(os.getenv("FUZZY_LONG_WORD", "8"))
+# Trigrams shared by more vocabulary words than this are skipped when collecting candidates
+FUZZY_MAX_POSTINGS = int(os.getenv("FUZZY_MAX_POSTINGS", "2000"))
+# Candidates per misspelled word that are compared by edit distance
+FUZZY_MAX_CANDIDATES = int(os.getenv("FUZZY_MAX_CANDIDATES", "20"))
+
+# Endings stripped to find the word an inflected form comes from ("charged", "writing")
+INFLECTIONS = ("ing", "ed", "es", "s", "ly", "er")
+
+
+def base_forms(word):
+    """The word and the words it may be an inflection of"""
+    forms = [word]
+    for ending in INFLECTIONS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            stem = word[:-len(ending)]
+            forms.extend((stem, stem + "e"))
+    return forms
+
+
+def trigrams(word):
+    """Character trigrams of a word padded with a space on each side: one per letter"""
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Edits (insert, delete, substitute, swap neighbours) from a to b, or limit + 1 once it must exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+def knowledge_base_vocabulary(index_terms):
+    """Words worth correcting towards: the knowledge-base index terms, the legal
+    jargon and the Hinglish spellings that normalize_query_tokens understands"""
+    words = set(index_terms)
+    for term in LEGAL_JARGON:
+        words.update(re.findall(r'\w+', term.lower()))
+    words.update(QUERY_SYNONYMS)
+    words.update(QUERY_SYNONYMS.values())
+    return words
+
+
+class FuzzyMatcher:
+    """Typo-tolerant spelling correction of user questions.
+
+    A character-trigram index over the vocabulary: a misspelled word
+    collects the vocabulary words sharing its trigrams (skipping trigrams
+    so common they don't discriminate), keeps the FUZZY_MAX_CANDIDATES
+    sharing the most, and picks the one fewest edits away, within one edit
+    for short words and two for long ones, as long as no other candidate is
+    as close. Words in the vocabulary, in `known` (e.g. the TF-IDF
+    vocabulary of the answers) or in COMMON_WORDS, inflections of those
+    ("writing", "charged"), stopwords, numbers and short words are left
+    alone: a correctly spelled word is never rewritten into jargon.
+    """
+
+    def __init__(self, words, known=None, max_postings=FUZZY_MAX_POSTINGS,
+                 max_candidates=FUZZY_MAX_CANDIDATES):
+        self.words = sorted(word for word in set(words) if word and not word.isdigit())
+        self._vocabulary = frozenset(self.words)
+        self._known = known
+        self.max_postings = max_postings
+        self.max_candidates = max_candidates
+        self._grams = {}
+        for word_id, word in enumerate(self.words):
+            for gram in trigrams(word):
+                self._grams.setdefault(gram, []).append(word_id)
+
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.corrections = 0
+        self.lookup_seconds = 0.0
+
+    def _is_known(self, word):
+        return any(
+            form in self._vocabulary or form in COMMON_WORDS
+            or (self._known is not None and self._known.get(form) is not None)
+            for form in base_forms(word)
+        )
+
+    def correct_word(self, word):
+        """The vocabulary word `word` is most likely a misspelling of, or None"""
+        if len(word) < FUZZY_MIN_LENGTH or word.isdigit() or word in QUERY_STOPWORDS or self._is_known(word):
+            return None
+        limit = 1 if len(word) < FUZZY_LONG_WORD else 2
+        grams = trigrams(word)
+        shared = Counter()
+        for gram in grams:
+            word_ids = self._grams.get(gram)
+            if word_ids and len(word_ids) <= self.max_postings:
+                shared.update(word_ids)
+        # Each edit changes at most three trigrams
+        needed = len(grams) - 3 * limit
+        best = None
+        tied = False
+        for word_id, count in shared.most_common(self.max_candidates):
+            if count < needed:
+                break
+            candidate = self.words[word_id]
+            distance = edit_distance(word, candidate, limit)
+            if distance > limit:
+                continue
+            if best is None or distance < best[0]:
+                best = (distance, candidate)
+                tied = False
+            elif distance == best[0]:
+                tied = True
+        # Two words equally close: no way to tell which was meant
+        return best[1] if best and not tied else None
+
+    def correct(self, text):
+        """The text with misspelled words replaced by their corrections (lowercased)"""
+        start = time.perf_counter()
+        corrected = 0
+
+        def replace(match):
+            nonlocal corrected
+            word = match.group(0).lower()
+            correction = self.correct_word(word)
+            if correction is None:
+                return match.group(0)
+            corrected += 1
+            return correction
+
+        result = re.sub(r'\w+', replace, text)
+        with self._lock:
+            self.lookups += 1
+            self.corrections += corrected
+            self.lookup_seconds += time.perf_counter() - start
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "words": len(self.words),
+                "trigrams": len(self._grams),
+                "lookups": self.lookups,
+                "corrections": self.corrections,
+                "avg_lookup_us": round(self.lookup_seconds / self.lookups * 1e6, 1) if self.lookups else 0.0
+            }
@@ -0,0 +1,290 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from collections.abc import Sequence
+
+import numpy as np
+
+from kb_search import KnowledgeBaseIndex, BM25_K1, BM25_B, KB_SEARCH_MAX_POSTINGS
+from kb_vectors import TfidfMatrix
+
+# Compiled knowledge base, built with: python kb_binary.py [source.json [output.kb]]
+# When it is present and newer than the JSON, workers map it instead of parsing the JSON.
+# Empty to always load the JSON.
+KB_BINARY_PATH = os.getenv("KB_BINARY_PATH", "legal_knowledge_base.kb")
+
+MAGIC = b"NYKB"
+FORMAT_VERSION = 1
+# magic, format version, number of sections
+HEADER = struct.Struct("<4sII")
+# section name, byte offset, byte length
+SECTION = struct.Struct("<16sQQ")
+
+
+def _string_table(strings):
+    """Offsets (uint64, one more than the strings) and the concatenated UTF-8 bytes"""
+    encoded = [text.encode('utf-8') for text in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(text) for text in encoded])
+    return offsets, b"".join(encoded)
+
+
+def _sorted_terms(terms):
+    """Terms in UTF-8 byte order (the same as code point order), as StringTable.get expects"""
+    return sorted(terms)
+
+
+def _bm25_sections(index):
+    terms = _sorted_terms(index._terms)
+    old_ids = [index._terms[term] for term in terms]
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    doc_ids = []
+    weights = []
+    for term_id, old_id in enumerate(old_ids):
+        begin, end = int(index._offsets[old_id]), int(index._offsets[old_id + 1])
+        doc_ids.append(index._doc_ids[begin:end])
+        weights.append(index._weights[begin:end])
+        offsets[term_id + 1] = offsets[term_id] + end - begin
+    term_offsets, term_data = _string_table(terms)
+    return {
+        "bm25.terms.off": term_offsets,
+        "bm25.terms": term_data,
+        "bm25.idf": index._idf[old_ids].astype(np.float32),
+        "bm25.offsets": offsets,
+        "bm25.doc_ids": np.concatenate(doc_ids).astype(np.int32) if doc_ids else np.zeros(0, dtype=np.int32),
+        "bm25.weights": np.concatenate(weights).astype(np.float32) if weights else np.zeros(0, dtype=np.float32)
+    }
+
+
+def _tfidf_sections(matrix):
+    terms = _sorted_terms(matrix.vocabulary)
+    old_ids = np.array([matrix.vocabulary[term] for term in terms], dtype=np.int64)
+    # Columns are renumbered in term order
+    columns = np.zeros(len(terms), dtype=np.int32)
+    columns[old_ids] = np.arange(len(terms), dtype=np.int32)
+    term_offsets, term_data = _string_table(terms)
+    return {
+        "tfidf.terms.off": term_offsets,
+        "tfidf.terms": term_data,
+        "tfidf.idf": matrix.idf[old_ids].astype(np.float32),
+        "tfidf.indptr": matrix.indptr.astype(np.int64),
+        "tfidf.indices": columns[matrix.indices],
+        "tfidf.data": matrix.data.astype(np.float32),
+        "tfidf.nonempty": matrix._nonempty.astype(np.int64)
+    }
+
+
+def compile_kb(qa_pairs, path, source=None):
+    """Write the knowledge base and its BM25 and TF-IDF indexes to one binary file.
+
+    Layout: header, section table, then each section 8-byte aligned. Strings
+    are string tables (uint64 offsets plus UTF-8 bytes), everything else
+    little-endian numpy arrays, so the loader maps them without parsing.
+    """
+    start = time.perf_counter()
+    texts = []
+    for qa_pair in qa_pairs:
+        texts.append(qa_pair["question"])
+        texts.append(qa_pair["answer"])
+    text_offsets, text_data = _string_table(texts)
+    meta = {
+        "entries": len(qa_pairs),
+        "bm25_k1": BM25_K1,
+        "bm25_b": BM25_B,
+        "built_at": time.time(),
+        "source": source
+    }
+    sections = {
+        "meta": json.dumps(meta).encode('utf-8'),
+        "text.off": text_offsets,
+        "text": text_data
+    }
+    sections.update(_bm25_sections(KnowledgeBaseIndex.build([qa_pair["question"] for qa_pair in qa_pairs])))
+    sections.update(_tfidf_sections(TfidfMatrix.build(qa_pairs)))
+
+    position = HEADER.size + SECTION.size * len(sections)
+    table = []
+    blobs = []
+    for name, value in sections.items():
+        blob = value if isinstance(value, bytes) else value.astype(value.dtype.newbyteorder('<')).tobytes()
+        padding = -position % 8
+        blobs.append(b"\0" * padding + blob)
+        position += padding
+        table.append(SECTION.pack(name.encode('ascii'), position, len(blob)))
+        position += len(blob)
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(sections)))
+        f.writelines(table)
+        f.writelines(blobs)
+    # A new inode: workers that mapped the old file keep reading it until they reopen
+    os.replace(temp_path, path)
+    print(f"Compiled {len(qa_pairs)} knowledge-base entries to {path} "
+          f"({position} bytes) in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+class StringTable:
+    """Strings of a mapped string table, decoded on access"""
+
+    def __init__(self, offsets, data):
+        # memoryview indexing returns plain ints, cheaper than numpy scalars
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def _bytes(self, index):
+        return bytes(self._data[self._offsets[index]:self._offsets[index + 1]])
+
+    def __getitem__(self, index):
+        return self._bytes(index).decode('utf-8')
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+    def get(self, term, default=None):
+        """Position of `term` by binary search (sorted tables only), like dict.get"""
+        key = term.encode('utf-8')
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._bytes(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self) and self._bytes(low) == key:
+            return low
+        return default
+
+
+class MappedQAPairs(Sequence):
+    """The legal_qa_pairs list, read from the mapped text table one entry at a time"""
+
+    def __init__(self, texts):
+        self._texts = texts
+
+    def __len__(self):
+        return len(self._texts) // 2
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("knowledge-base index out of range")
+        return {"question": self._texts[2 * index], "answer": self._texts[2 * index + 1]}
+
+
+class MappedKnowledgeBase:
+    """A compiled knowledge base mapped read-only.
+
+    Opening it reads the header and section table only; the arrays are
+    numpy views of the mapping, so the indexes built on them cost nothing
+    until queried, and every worker mapping the same file shares its pages
+    through the OS page cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} compiled knowledge base")
+        self._sections = {}
+        for number in range(count):
+            name, offset, length = SECTION.unpack_from(self._map, HEADER.size + number * SECTION.size)
+            self._sections[name.rstrip(b"\0").decode('ascii')] = (offset, length)
+        self.meta = json.loads(self._bytes("meta"))
+        self.qa_pairs = MappedQAPairs(self._strings("text"))
+
+    def _bytes(self, name):
+        offset, length = self._sections[name]
+        return self._map[offset:offset + length]
+
+    def _view(self, name):
+        offset, length = self._sections[name]
+        return memoryview(self._map)[offset:offset + length]
+
+    def _array(self, name, dtype):
+        offset, length = self._sections[name]
+        dtype = np.dtype(dtype).newbyteorder('<')
+        return np.frombuffer(self._map, dtype=dtype, count=length // dtype.itemsize, offset=offset)
+
+    def _strings(self, name):
+        return StringTable(self._view(f"{name}.off").cast('Q'), self._view(name))
+
+    def bm25_index(self, max_postings=KB_SEARCH_MAX_POSTINGS):
+        """KnowledgeBaseIndex over the mapped postings"""
+        return KnowledgeBaseIndex(
+            self._strings("bm25.terms"),
+            self._array("bm25.idf", np.float32),
+            self._array("bm25.offsets", np.int64),
+            self._array("bm25.doc_ids", np.int32),
+            self._array("bm25.weights", np.float32),
+            self.meta["entries"],
+            max_postings
+        )
+
+    def tfidf_matrix(self):
+        """TfidfMatrix over the mapped CSR arrays"""
+        return TfidfMatrix(
+            self._strings("tfidf.terms"),
+            self._array("tfidf.idf", np.float32),
+            self._array("tfidf.indptr", np.int64),
+            self._array("tfidf.indices", np.int32),
+            self._array("tfidf.data", np.float32),
+            self._array("tfidf.nonempty", np.int64)
+        )
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "bytes": len(self._map),
+            "entries": self.meta["entries"],
+            "built_at": self.meta["built_at"]
+        }
+
+
+def _source_stamp(source_path, digest=None):
+    stat = os.stat(source_path)
+    return {"path": source_path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+
+
+def open_compiled_kb(source_path, path=KB_BINARY_PATH):
+    """The compiled knowledge base if it exists and was built from the current source, else None"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        kb = MappedKnowledgeBase(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Compiled knowledge base unreadable ({path}): {str(e)}")
+        return None
+    source = kb.meta.get("source")
+    if source and os.path.exists(source_path):
+        stamp = _source_stamp(source_path)
+        if (stamp["size"], stamp["mtime_ns"]) != (source["size"], source["mtime_ns"]):
+            print(f"Compiled knowledge base {path} is older than {source_path}; loading the JSON")
+            return None
+    print(f"Knowledge base mapped from {path}: {kb.meta['entries']} entries")
+    return kb
+
+
+# Build step: python kb_binary.py [legal_knowledge_base.json [legal_knowledge_base.kb]]
+if __name__ == '__main__':
+    source_path = sys.argv[1] if len(sys.argv) > 1 else 'legal_knowledge_base.json'
+    output_path = sys.argv[2] if len(sys.argv) > 2 else (KB_BINARY_PATH or 'legal_knowledge_base.kb')
+    with open(source_path, 'rb') as f:
+        raw = f.read()
+    compile_kb(
+        json.loads(raw)["legal_qa_pairs"], output_path,
+        _source_stamp(source_path, hashlib.sha256(raw).hexdigest())
+    )
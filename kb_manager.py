@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from faq_warmup import build_faq_table
+from fuzzy_match import FuzzyMatcher, knowledge_base_vocabulary
+from kb_binary import open_compiled_kb, KB_BINARY_PATH
+from kb_search import KnowledgeBaseIndex
+from kb_vectors import TfidfMatrix
+from legal_data import DEFAULT_LEGAL_QA_PAIRS
+
+# The knowledge-base source, watched for changes
+KB_SOURCE_PATH = os.getenv("KB_SOURCE_PATH", "legal_knowledge_base.json")
+# Seconds between checks of the source file; 0 to load it once at startup only
+KB_RELOAD_INTERVAL = float(os.getenv("KB_RELOAD_INTERVAL", "30"))
+
+
+def _parse_qa_pairs(raw):
+    """legal_qa_pairs of a JSON knowledge base, checked before anything is built from it"""
+    qa_pairs = json.loads(raw)["legal_qa_pairs"]
+    if not isinstance(qa_pairs, list) or not all(
+        isinstance(qa_pair, dict) and isinstance(qa_pair.get("question"), str)
+        and isinstance(qa_pair.get("answer"), str)
+        for qa_pair in qa_pairs
+    ):
+        raise ValueError("legal_qa_pairs must be a list of {question, answer} strings")
+    return qa_pairs
+
+
+class KnowledgeBase:
+    """One version of the knowledge base and everything built from it.
+
+    Never changed once built: a reload builds a new one. A request reads
+    the manager's `current` once and uses that object throughout, so the
+    index it searched and the answers it returns always match.
+    """
+
+    def __init__(self, qa_pairs, index, vectors, fuzzy, faqs, digest, origin, compiled=None):
+        self.qa_pairs = qa_pairs
+        self.index = index
+        self.vectors = vectors
+        self.fuzzy = fuzzy
+        self.faqs = faqs
+        self.digest = digest
+        # Short content hash of the source file, or "builtin"
+        self.version = digest[:12] if digest else "builtin"
+        # "json", "compiled" or "builtin"
+        self.origin = origin
+        self.compiled = compiled
+        self.loaded_at = time.time()
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "origin": self.origin,
+            "entries": len(self.qa_pairs),
+            "loaded_at": self.loaded_at,
+            "compiled": self.compiled.stats() if self.compiled is not None else None
+        }
+
+
+class KnowledgeBaseManager:
+    """Loads the knowledge base and swaps in a new version when the source changes.
+
+    A background thread checks the source file's mtime and size every
+    `interval` seconds. When they change it hashes the content, and only a
+    new hash triggers a rebuild of the indexes and answer table, off the
+    request path. The new KnowledgeBase replaces `current` in one attribute
+    assignment, so readers never lock. A source that fails to parse is
+    logged and the current version keeps serving. A missing source serves
+    the built-in entries until the file appears.
+    """
+
+    def __init__(self, languages, format_response, source_path=KB_SOURCE_PATH,
+                 binary_path=KB_BINARY_PATH, interval=KB_RELOAD_INTERVAL, background=True):
+        self.languages = languages
+        self.format_response = format_response
+        self.source_path = source_path
+        self.binary_path = binary_path
+        self.interval = interval
+        self._lock = threading.Lock()  # one reload at a time; readers don't take it
+        self._stamp = None  # (mtime_ns, size) of the source last looked at
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+
+        self.current = self._load()
+        if background and interval > 0:
+            threading.Thread(target=self._watch_loop, daemon=True, name="kb-reload").start()
+
+    def _build(self, qa_pairs, digest, origin, compiled=None):
+        start = time.perf_counter()
+        if compiled is not None:
+            index = compiled.bm25_index()
+            vectors = compiled.tfidf_matrix()
+        else:
+            index = KnowledgeBaseIndex.build([qa_pair["question"] for qa_pair in qa_pairs])
+            vectors = TfidfMatrix.build(qa_pairs)
+        # Words from the answers are real words, not typos of the question terms.
+        # Built from every distinct question term, even for a compiled knowledge
+        # base: the one step here that grows with the vocabulary (see README)
+        fuzzy = FuzzyMatcher(knowledge_base_vocabulary(index.terms()), known=vectors.vocabulary)
+        faqs = build_faq_table(qa_pairs, self.languages, self.format_response)
+        kb = KnowledgeBase(qa_pairs, index, vectors, fuzzy, faqs, digest, origin, compiled)
+        print(f"Knowledge base {kb.version} ({origin}, {len(qa_pairs)} entries) "
+              f"built in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return kb
+
+    def _load(self, current=None):
+        """A KnowledgeBase for the source as it is now, or None if its content equals `current`"""
+        try:
+            stat = os.stat(self.source_path)
+            self._stamp = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            self._stamp = None
+
+        # open_compiled_kb only returns a file built from the current source (or any, if it's gone)
+        compiled = open_compiled_kb(self.source_path, self.binary_path)
+        digest = (compiled.meta.get("source") or {}).get("sha256") if compiled is not None else None
+        if digest is None:
+            compiled = None
+            if self._stamp is None:
+                if current is not None and current.origin == "builtin":
+                    return None
+                print(f"Knowledge base {self.source_path} not found; serving the built-in entries")
+                return self._build(DEFAULT_LEGAL_QA_PAIRS, None, "builtin")
+            with open(self.source_path, 'rb') as f:
+                raw = f.read()
+            digest = hashlib.sha256(raw).hexdigest()
+        if current is not None and digest == current.digest:
+            return None
+        if compiled is not None:
+            return self._build(compiled.qa_pairs, digest, "compiled", compiled)
+        return self._build(_parse_qa_pairs(raw), digest, "json")
+
+    def check(self):
+        """Reload if the source changed since the last check; True if a new version is serving"""
+        with self._lock:
+            try:
+                stat = os.stat(self.source_path)
+                stamp = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                stamp = None
+            if stamp == self._stamp:
+                return False
+            try:
+                kb = self._load(self.current)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                # Keep serving the current version; a fixed file has a new mtime and is retried
+                self.failures += 1
+                self.last_error = str(e)
+                print(f"Knowledge base reload failed, still serving {self.current.version}: {str(e)}")
+                return False
+            if kb is None:
+                return False
+            self.current = kb
+            self.reloads += 1
+            self.last_error = None
+            return True
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self.interval)
+            self.check()
+
+    def stats(self):
+        # No lock: a reload in progress holds it for as long as the rebuild takes
+        return dict(
+            self.current.stats(),
+            source=self.source_path,
+            reload_interval=self.interval,
+            reloads=self.reloads,
+            failures=self.failures,
+            last_error=self.last_error
+        )
@@ -0,0 +1,221 @@
+import math
+import os
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from language_utils import normalize_query_tokens
+
+# BM25 term-frequency saturation and document-length normalization
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Confidence a knowledge-base hit needs to be used as the answer
+KB_SEARCH_THRESHOLD = float(os.getenv("KB_SEARCH_THRESHOLD", "0.5"))
+# Looser confidence accepted when the answer is only a fallback for OpenAI
+KB_FALLBACK_THRESHOLD = float(os.getenv("KB_FALLBACK_THRESHOLD", "0.4"))
+# Confidence a hit found only after correcting the spelling needs, on any path:
+# the correction is itself a guess ("jamanat" read as "zamanat")
+KB_CORRECTED_THRESHOLD = float(os.getenv("KB_CORRECTED_THRESHOLD", "0.7"))
+# Share of the question's terms an entry must contain to answer it, so one
+# generic word in common ("bail" of "what is regular bail") isn't an answer
+KB_MIN_COVERAGE = float(os.getenv("KB_MIN_COVERAGE", "0.6"))
+# Confidence an entry missing any term of a short question (at most
+# KB_SHORT_QUERY_TERMS terms) needs: "section 302 ipc" is not about 498A
+KB_PARTIAL_THRESHOLD = float(os.getenv("KB_PARTIAL_THRESHOLD", "0.7"))
+KB_SHORT_QUERY_TERMS = int(os.getenv("KB_SHORT_QUERY_TERMS", "3"))
+# Postings scored per query term, highest impact first; bounds the cost of
+# very common terms as the knowledge base grows
+KB_SEARCH_MAX_POSTINGS = int(os.getenv("KB_SEARCH_MAX_POSTINGS", "1000"))
+
+
+class SearchHit:
+    """One scored knowledge-base entry"""
+
+    __slots__ = ('index', 'score', 'confidence', 'coverage')
+
+    def __init__(self, index, score, confidence, coverage):
+        self.index = index
+        self.score = score
+        self.confidence = confidence
+        # Share of the query terms found in the entry
+        self.coverage = coverage
+
+    def as_dict(self):
+        return {
+            "index": self.index,
+            "score": round(self.score, 4),
+            "confidence": round(self.confidence, 4),
+            "coverage": round(self.coverage, 4)
+        }
+
+
+class KnowledgeBaseIndex:
+    """BM25 search over the knowledge-base questions.
+
+    Built once from the questions (build()): each is tokenized with
+    normalize_query_tokens (English/Hinglish stopwords dropped, synonyms
+    merged) into an inverted index stored CSR-style, one slice of document
+    ids and precomputed BM25 weights per term, sorted by weight. A query only
+    touches the postings of its own terms, at most `max_postings` each.
+
+    Confidence is the score as a fraction of what a document matching every
+    query term once would get, so it is comparable between queries; query
+    words the index has never seen count as unmatched. Coverage is the share
+    of query terms the document contains, whatever their weight.
+    """
+
+    def __init__(self, terms, idf, offsets, doc_ids, weights, size, max_postings=KB_SEARCH_MAX_POSTINGS):
+        """Index over prebuilt arrays: use build(), or kb_binary for a memory-mapped one.
+
+        `terms` maps a term to its id (anything with get() and len()), and
+        the postings of term t are doc_ids/weights[offsets[t]:offsets[t + 1]].
+        """
+        self.size = size
+        self.max_postings = max_postings
+        # Unseen terms get the idf of a term in no document
+        self.max_idf = math.log(1 + (size + 0.5) / 0.5)
+        self._terms = terms
+        self._idf = idf
+        self._offsets = offsets
+        self._doc_ids = doc_ids
+        self._weights = weights
+
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.search_seconds = 0.0
+
+    @classmethod
+    def build(cls, documents, k1=BM25_K1, b=BM25_B, max_postings=KB_SEARCH_MAX_POSTINGS):
+        """Tokenize and index the documents"""
+        size = len(documents)
+        term_docs = {}
+        lengths = np.zeros(size, dtype=np.float32)
+        for doc_id, text in enumerate(documents):
+            tokens = normalize_query_tokens(text)
+            lengths[doc_id] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                term_docs.setdefault(term, []).append((doc_id, tf))
+        average_length = float(lengths.mean()) if size and lengths.any() else 1.0
+
+        terms = {}
+        idf = np.zeros(len(term_docs), dtype=np.float32)
+        offsets = np.zeros(len(term_docs) + 1, dtype=np.int64)
+        doc_ids = []
+        weights = []
+        for term_id, (term, postings) in enumerate(term_docs.items()):
+            ids = np.array([doc_id for doc_id, _ in postings], dtype=np.int32)
+            tfs = np.array([tf for _, tf in postings], dtype=np.float32)
+            term_idf = math.log(1 + (size - len(postings) + 0.5) / (len(postings) + 0.5))
+            norm = k1 * (1 - b + b * lengths[ids] / average_length)
+            term_weights = (term_idf * tfs * (k1 + 1) / (tfs + norm)).astype(np.float32)
+            order = np.argsort(-term_weights, kind='stable')
+            doc_ids.append(ids[order])
+            weights.append(term_weights[order])
+            terms[term] = term_id
+            idf[term_id] = term_idf
+            offsets[term_id + 1] = offsets[term_id] + len(postings)
+        return cls(
+            terms, idf, offsets,
+            np.concatenate(doc_ids) if doc_ids else np.zeros(0, dtype=np.int32),
+            np.concatenate(weights) if weights else np.zeros(0, dtype=np.float32),
+            size, max_postings
+        )
+
+    def terms(self):
+        """Every indexed term"""
+        return iter(self._terms)
+
+    def search(self, query, k=5, threshold=0.0, min_coverage=0.0, partial_threshold=0.0):
+        """Best `k` entries for the query with confidence >= threshold and coverage >= min_coverage, best first.
+
+        Entries missing a term of a query of at most KB_SHORT_QUERY_TERMS
+        terms also need confidence >= partial_threshold.
+        """
+        start = time.perf_counter()
+        hits = self._search(query, k, threshold, min_coverage, partial_threshold)
+        with self._lock:
+            self.searches += 1
+            self.search_seconds += time.perf_counter() - start
+        return hits
+
+    def best(self, query, threshold=KB_SEARCH_THRESHOLD, min_coverage=KB_MIN_COVERAGE,
+             partial_threshold=KB_PARTIAL_THRESHOLD):
+        """Index of the best entry good enough to answer the query, else None"""
+        hits = self.search(query, 1, threshold, min_coverage, partial_threshold)
+        return hits[0].index if hits else None
+
+    def _search(self, query, k, threshold, min_coverage, partial_threshold):
+        query_terms = Counter(normalize_query_tokens(query))
+        if not query_terms or not self.size:
+            return []
+        length = sum(query_terms.values())
+        ideal = 0.0
+        spans = []
+        for term, count in query_terms.items():
+            term_id = self._terms.get(term)
+            if term_id is None:
+                ideal += count * self.max_idf
+                continue
+            ideal += count * float(self._idf[term_id])
+            begin = int(self._offsets[term_id])
+            end = min(int(self._offsets[term_id + 1]), begin + self.max_postings)
+            spans.append((begin, end, count))
+        if not spans:
+            return []
+
+        if len(spans) == 1:
+            # Postings are sorted by weight: the first k are the answer
+            begin, end, count = spans[0]
+            candidates = self._doc_ids[begin:min(end, begin + k)]
+            scores = self._weights[begin:min(end, begin + k)] * count
+            ranked = zip(candidates.tolist(), scores.tolist())
+            matched = None
+            coverage = count / length
+        else:
+            totals = np.zeros(self.size, dtype=np.float32)
+            matched = np.zeros(self.size, dtype=np.int32)
+            for begin, end, count in spans:
+                # A document appears once per term, so plain fancy-index adds are safe
+                totals[self._doc_ids[begin:end]] += self._weights[begin:end] * count
+                matched[self._doc_ids[begin:end]] += count
+            candidates = np.concatenate([self._doc_ids[begin:end] for begin, end, _ in spans])
+            scores = totals[candidates]
+            # Each document is in `candidates` at most once per term
+            keep = min(len(candidates), k * len(spans))
+            if keep < len(candidates):
+                top = np.argpartition(-scores, keep - 1)[:keep]
+                candidates, scores = candidates[top], scores[top]
+            order = np.argsort(-scores, kind='stable')
+            ranked = zip(candidates[order].tolist(), scores[order].tolist())
+
+        hits = []
+        seen = set()
+        for doc_id, score in ranked:
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            confidence = min(1.0, score / ideal)
+            if confidence < threshold:
+                break
+            if matched is not None:
+                coverage = int(matched[doc_id]) / length
+            if coverage < min_coverage:
+                continue
+            if coverage < 1.0 and length <= KB_SHORT_QUERY_TERMS and confidence < partial_threshold:
+                continue
+            hits.append(SearchHit(doc_id, score, confidence, coverage))
+            if len(hits) == k:
+                break
+        return hits
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": self.size,
+                "terms": len(self._terms),
+                "postings": len(self._doc_ids),
+                "searches": self.searches,
+                "avg_search_us": round(self.search_seconds / self.searches * 1e6, 1) if self.searches else 0.0
+            }
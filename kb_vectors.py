@@ -0,0 +1,203 @@
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from language_utils import normalize_query_tokens
+
+# Cosine similarity a knowledge-base entry needs to serve as a fallback answer.
+# Unrelated questions reach about 0.3 on the shipped knowledge base ("how to file
+# income tax return" against "Can I return a product bought online?"); re-tune
+# with the offline evaluation below when the knowledge base changes.
+KB_VECTOR_THRESHOLD = float(os.getenv("KB_VECTOR_THRESHOLD", "0.35"))
+# Queries scored together in one matrix product by score_batch
+KB_VECTOR_BATCH_SIZE = int(os.getenv("KB_VECTOR_BATCH_SIZE", "256"))
+
+
+def entry_tokens(question, answer):
+    """Tokens of a knowledge-base entry; the question counts twice, it says what the entry is about"""
+    question_tokens = normalize_query_tokens(question)
+    return question_tokens + question_tokens + normalize_query_tokens(answer)
+
+
+class TfidfMatrix:
+    """TF-IDF vectors of the knowledge-base entries as one sparse matrix.
+
+    Rows are entries (question and answer text), columns the vocabulary;
+    values are sublinear tf times smoothed idf, each row scaled to unit
+    length. The matrix is kept in CSR form as three numpy arrays (indptr,
+    indices, data), so scoring a query against every entry is one sparse
+    matrix-vector product and scoring a batch of queries is one sparse-dense
+    matrix product, both cosine similarities.
+    """
+
+    def __init__(self, vocabulary, idf, indptr, indices, data, nonempty=None):
+        """Matrix over prebuilt CSR arrays: use build(), or kb_binary for a memory-mapped one.
+
+        `vocabulary` maps a term to its column (anything with get() and len()).
+        """
+        self.size = len(indptr) - 1
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        # reduceat can't sum empty rows, so products are reduced over the non-empty ones only
+        self._nonempty = np.flatnonzero(np.diff(indptr)) if nonempty is None else nonempty
+        self._row_starts = indptr[:-1][self._nonempty]
+
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.score_seconds = 0.0
+
+    @classmethod
+    def build(cls, qa_pairs):
+        """Vectorize the knowledge-base entries"""
+        rows = [Counter(entry_tokens(qa_pair["question"], qa_pair["answer"])) for qa_pair in qa_pairs]
+        size = len(rows)
+        vocabulary = {}
+        df = Counter()
+        for row in rows:
+            df.update(row.keys())
+        for term in df:
+            vocabulary[term] = len(vocabulary)
+        idf = np.ones(len(vocabulary), dtype=np.float32)
+        for term, count in df.items():
+            idf[vocabulary[term]] = math.log((1 + size) / (1 + count)) + 1
+
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        indices = []
+        data = []
+        for row_id, row in enumerate(rows):
+            columns = np.array([vocabulary[term] for term in row], dtype=np.int32)
+            values = np.array([1 + math.log(count) for count in row.values()], dtype=np.float32) * idf[columns]
+            norm = np.linalg.norm(values)
+            order = np.argsort(columns)
+            indices.append(columns[order])
+            data.append(values[order] / norm if norm else values[order])
+            indptr[row_id + 1] = indptr[row_id] + len(columns)
+        return cls(
+            vocabulary, idf, indptr,
+            np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+            np.concatenate(data) if data else np.zeros(0, dtype=np.float32)
+        )
+
+    def query_vectors(self, queries):
+        """Unit TF-IDF vectors of the queries as a dense (vocabulary x queries) block"""
+        block = np.zeros((len(self.vocabulary), len(queries)), dtype=np.float32)
+        for column, query in enumerate(queries):
+            for term, count in Counter(normalize_query_tokens(query)).items():
+                term_id = self.vocabulary.get(term)
+                if term_id is not None:
+                    block[term_id, column] = (1 + math.log(count)) * self.idf[term_id]
+        norms = np.linalg.norm(block, axis=0)
+        norms[norms == 0] = 1.0
+        return block / norms
+
+    def _multiply(self, block):
+        """The CSR matrix times a dense (vocabulary x k) block: (entries x k) scores"""
+        scores = np.zeros((self.size, block.shape[1]), dtype=np.float32)
+        if len(self.data):
+            products = self.data[:, None] * block[self.indices]
+            scores[self._nonempty] = np.add.reduceat(products, self._row_starts, axis=0)
+        return scores
+
+    def score(self, query):
+        """Cosine similarity of the query to every entry"""
+        start = time.perf_counter()
+        vector = self.query_vectors([query])[:, 0]
+        scores = np.zeros(self.size, dtype=np.float32)
+        if len(self.data):
+            products = self.data * vector[self.indices]
+            scores[self._nonempty] = np.add.reduceat(products, self._row_starts)
+        with self._lock:
+            self.queries += 1
+            self.score_seconds += time.perf_counter() - start
+        return scores
+
+    def score_batch(self, queries, batch_size=KB_VECTOR_BATCH_SIZE):
+        """Cosine similarities of many queries at once: a (queries x entries) matrix"""
+        start = time.perf_counter()
+        scores = np.zeros((len(queries), self.size), dtype=np.float32)
+        # The product materializes (nonzeros x chunk) values; keep that to about 16M
+        batch_size = max(1, min(batch_size, (1 << 24) // max(len(self.data), len(self.vocabulary), 1)))
+        for begin in range(0, len(queries), batch_size):
+            chunk = queries[begin:begin + batch_size]
+            scores[begin:begin + len(chunk)] = self._multiply(self.query_vectors(chunk)).T
+        with self._lock:
+            self.queries += len(queries)
+            self.score_seconds += time.perf_counter() - start
+        return scores
+
+    def best(self, query, threshold=KB_VECTOR_THRESHOLD):
+        """Index of the most similar entry if it reaches the threshold, else None"""
+        scores = self.score(query)
+        if not self.size:
+            return None
+        best = int(np.argmax(scores))
+        return best if scores[best] >= threshold else None
+
+    @staticmethod
+    def top_k(scores, k=5):
+        """Indices of the k highest scores in each row of a score_batch matrix, best first"""
+        k = min(k, scores.shape[1])
+        if k <= 0:
+            return np.zeros((scores.shape[0], 0), dtype=np.int64)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind='stable')
+        return np.take_along_axis(top, order, axis=1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": self.size,
+                "vocabulary": len(self.vocabulary),
+                "nonzeros": len(self.data),
+                "queries": self.queries,
+                "avg_query_us": round(self.score_seconds / self.queries * 1e6, 1) if self.queries else 0.0
+            }
+
+
+def evaluate(matrix, examples, k=5, threshold=KB_VECTOR_THRESHOLD):
+    """Accuracy on (query, expected entry index) pairs, and what the threshold would serve.
+
+    An expected index of None marks a question no entry answers. Top-1 and
+    top-k accuracy are over the others; "served_right" and "served_wrong"
+    count the fallback answers `threshold` lets through that are the
+    expected entry and that are not (any served for a None question is wrong).
+    """
+    scores = matrix.score_batch([query for query, _ in examples])
+    top = TfidfMatrix.top_k(scores, k)
+    expected = np.array([-1 if index is None else index for _, index in examples])[:, None]
+    answerable = expected[:, 0] >= 0
+    served = scores[np.arange(len(examples)), top[:, 0]] >= threshold
+    right = served & (top[:, 0] == expected[:, 0])
+    return {
+        "examples": len(examples),
+        "unanswerable": int(np.sum(~answerable)),
+        "top1": round(float(np.mean(top[answerable, :1] == expected[answerable])), 4) if answerable.any() else 0.0,
+        f"top{k}": round(float(np.mean((top[answerable] == expected[answerable]).any(axis=1))), 4) if answerable.any() else 0.0,
+        "threshold": threshold,
+        "served_right": int(np.sum(right)),
+        "served_wrong": int(np.sum(served & ~right))
+    }
+
+
+# Offline evaluation: python kb_vectors.py examples.jsonl [threshold]
+# with one {"query": "...", "index": <expected entry, or null if none answers it>} per line
+if __name__ == '__main__':
+    from kb_manager import KB_SOURCE_PATH
+
+    with open(KB_SOURCE_PATH, 'r', encoding='utf-8') as f:
+        qa_pairs = json.load(f)["legal_qa_pairs"]
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else KB_VECTOR_THRESHOLD
+    print(json.dumps(evaluate(
+        TfidfMatrix.build(qa_pairs), [(l["query"], l.get("index")) for l in lines], threshold=threshold
+    )))
@@ -1,3 +1,5 @@
+import re
+
 # Multilingual support dictionary
 LANGUAGE_TRANSLATIONS = {
     "hindi": {
@@ -286,4 +288,146 @@ def identify_legal_jargon(text, language='english'):
             if term.lower() in text.lower():
                 found_terms.append(term)
     
-    return found_terms
\ No newline at end of file
+    return found_terms
+
+# Filler words (English and Hinglish) ignored when comparing user questions
+QUERY_STOPWORDS = frozenset("""
+a an the is are was were be been being am i me my mine we us our you your he him his she her it its
+they them their this that these those of to in on at by for with from into about as and or but if
+then so not no do does did done can could should would will shall may might must what which who
+whom whose when where why how please tell explain know want need kindly any some there here
+steps step way ways
+kya kaise kaisa kaisi kab kahan kaun kyun kyu kyon hai hain ho hota hoti hote tha thi ka ki ke ko
+se me mein par pe aur ya bhi toh to karna karne kare karen karein karu karun karo kar karte karti
+sakta sakti sakte chahiye mujhe mera meri mere hum humein hume aap apna apni apne batao bataye
+bataiye samjhao koi kuch
+""".split())
+
+# Correctly spelled everyday words (English and Hinglish) that the spelling
+# correction must leave alone, even though no knowledge-base entry uses them
+COMMON_WORDS = frozenset("""
+about above accept account act action add address after again against age agree all allow
+alone already also always amount angry answer anyone anything apartment apply area ask attack
+away baby back bad bank because become before begin behind believe better between big bike birth
+body book born borrow both boy break bring brother build business buy call car card care case
+cash catch cause certificate change charge cheat check cheque child children city claim class
+clear close college come company contract copy cost country couple cousin cover cut damage date
+daughter day dead death debt decide delay deliver deposit die different doctor document dog door
+down drink drive driving drunk due during early earn easy eat education election electricity
+else email employee employer end enough enter every everyone exam example fail family far farm
+father fear fee feel fight fill final find fine fire first food force forget form free friend
+full fund gas get girl give go good government group guide hand happen happy hard have health
+hear help high hit hold holiday home hospital hour house husband idea illegal important income
+information inside instead insurance job join just keep kill kind land language last late later
+leave left legal less letter licence license life light like line list little live loan local
+long look lose lost loss low made make man many marriage married marry medical meet member
+message minor minute mistake mobile money month more mother move much murder name near neighbour
+neighbor never new news next night nothing notice number office officer often old online only
+open order other own paid paper parent parents part party pass passport past pay payment pension
+people person phone place plan plot police poor post power problem property protect provide
+public punishment put question quick rape read real reason receive refund refuse regular
+relative release report rest result return right road rule run safe salary same save school
+second see sell send service share shop short show sign sister small social someone son soon
+speak start state station still stop story street student study subject such support sure take
+talk tax teacher tell than thing think time today together town transfer travel true try turn
+under understand until upon use village visit wage wait walk wall want warrant water week well
+wife will wish woman women word work worker write wrong year young
+aadmi aaj adhikar agar agrim ab abhi baat bacche baccha bahut bank bap behen beta beti bhai
+bijli biwi dena dhokha din dost ghar gaon galat jaldi jamanat jameen jamin jan jana kaam kagaz
+kal kanoon kanun karza kitna kitne ladka ladki lena log madad maa milega milegi milna naukri
+paisa paise pakad pati patni pehle police raat rishta sach sahi sarkar sarkari shaadi shadi
+talaq thana zameen zamin
+""".split())
+
+# Different words users pick for the same legal action
+QUERY_SYNONYMS = {
+    "lodge": "file",
+    "lodging": "file",
+    "filing": "file",
+    "filed": "file",
+    "darj": "file",
+    "dakhil": "file",
+    "daakhil": "file",
+    "shikayat": "complaint",
+    "complain": "complaint",
+    "giraftari": "arrest",
+    "girftari": "arrest",
+    "arrested": "arrest",
+    "zamanat": "bail",
+    "jamanat": "bail",
+    "vakil": "lawyer",
+    "wakil": "lawyer",
+    "advocate": "lawyer",
+    "adalat": "court",
+    "kiraya": "rent",
+    "kirayedar": "tenant",
+    "makan": "house",
+    "maalik": "owner",
+    "malik": "owner"
+}
+
+# Words that change what a legal question asks: negations, question words and
+# modals. Keyword search drops them, but "can police arrest me without a
+# warrant" must never share a cached answer with "... with a warrant".
+QUERY_MEANING_WORDS = frozenset("""
+not no never without nor cannot cant dont doesnt didnt isnt arent wont
+what which who whom whose when where why how
+can could should would will shall may might must
+""".split())
+
+# Hinglish spellings of those words
+QUERY_MEANING_SYNONYMS = {
+    "nahi": "not",
+    "nahin": "not",
+    "mat": "not",
+    "bina": "without",
+    "kab": "when",
+    "kahan": "where",
+    "kaun": "who",
+    "kyun": "why",
+    "kyu": "why",
+    "kyon": "why",
+    "kaise": "how",
+    "chahiye": "should",
+    "sakta": "can",
+    "sakti": "can",
+    "sakte": "can"
+}
+
+def normalize_query_tokens(text, keep_meaning=False):
+    """
+    Split a user question into comparable tokens
+    
+    Lowercases, maps synonyms onto one spelling and drops filler words, so
+    "FIR kaise file kare" and "how do I lodge an FIR" give the same tokens.
+    With keep_meaning, negations, question words and modals are kept (in
+    English spelling), so "when should I file an FIR" and "how to file an
+    FIR" stay apart.
+    
+    Args:
+        text (str): The user's question
+        keep_meaning (bool): Keep QUERY_MEANING_WORDS
+        
+    Returns:
+        list: Normalized tokens in their original order
+    """
+    text = text.lower()
+    if keep_meaning:
+        # "can't" is one word here, not "can" and "t"
+        text = re.sub(r"['\u2019]", "", text)
+    tokens = []
+    for token in re.findall(r'\w+', text):
+        if keep_meaning:
+            token = QUERY_MEANING_SYNONYMS.get(token, token)
+            if token in QUERY_MEANING_WORDS:
+                tokens.append(token)
+                continue
+        token = QUERY_SYNONYMS.get(token, token)
+        if token not in QUERY_STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+def question_intent(text):
+    """The negations, question words and modals of a question, as a set"""
+    return frozenset(token for token in normalize_query_tokens(text, keep_meaning=True)
+                     if token in QUERY_MEANING_WORDS)
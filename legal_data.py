@@ -1,5 +1,3 @@
-import json
-import os
 
 # I am Defineng legal codes and sections for reference..Its useful to know about my legal knowledge and app's legal knowlege on the same
 
@@ -33,26 +31,18 @@ IPC_SECTIONS = {
     "Section 499-502": "Defamation"
 }
 
-# Loading myyyyy legal knowledge base
-try:
-    with open('legal_knowledge_base.json', 'r') as f:
-        legal_db = json.load(f)
-except FileNotFoundError:
-    legal_db = {
-        "legal_qa_pairs": [
-            {
-                "question": "What are my rights during an arrest?",
-                "answer": "During an arrest in India, you have several rights under Section 41 and 50 of the CrPC and Article 22 of the Constitution:\n\n1. Right to know the grounds of arrest\n2. Right to inform a relative or friend about your arrest\n3. Right to legal representation/meet a lawyer of your choice\n4. Right to be produced before a magistrate within 24 hours\n5. Right to medical examination\n6. Right against self-incrimination (you can remain silent)\n7. Right against torture or illegal detention\n\nWomen cannot be arrested after sunset and before sunrise except in exceptional circumstances, and only by female police officers.\n\nI am an AI assistant and not a licensed legal advisor. Please consult a lawyer for serious or urgent matters."
-            },
-            {
-                "question": "How do I file an FIR?",
-                "answer": "To file a First Information Report (FIR) in India:\n\n1. Visit the police station having jurisdiction where the crime occurred\n2. Provide details of the incident to the officer in charge (date, time, place, description of the event, names of suspects if known)\n3. The police officer must register your FIR for cognizable offenses (under Section 154 of CrPC)\n4. Review the FIR before signing it\n5. Collect a free copy of the FIR\n\nIf the police refuse to register your FIR:\n- Approach the Superintendent of Police or other higher officers\n- File a complaint to the Judicial Magistrate under Section 156(3) CrPC\n- File a complaint online on the state police portal\n\nI am an AI assistant and not a licensed legal advisor. Please consult a lawyer for serious or urgent matters."
-            }
-        ]
+# Served when legal_knowledge_base.json is missing, so the app still answers the
+# most common questions. The knowledge base itself is loaded by kb_manager.py.
+DEFAULT_LEGAL_QA_PAIRS = [
+    {
+        "question": "What are my rights during an arrest?",
+        "answer": "During an arrest in India, you have several rights under Section 41 and 50 of the CrPC and Article 22 of the Constitution:\n\n1. Right to know the grounds of arrest\n2. Right to inform a relative or friend about your arrest\n3. Right to legal representation/meet a lawyer of your choice\n4. Right to be produced before a magistrate within 24 hours\n5. Right to medical examination\n6. Right against self-incrimination (you can remain silent)\n7. Right against torture or illegal detention\n\nWomen cannot be arrested after sunset and before sunrise except in exceptional circumstances, and only by female police officers.\n\nI am an AI assistant and not a licensed legal advisor. Please consult a lawyer for serious or urgent matters."
+    },
+    {
+        "question": "How do I file an FIR?",
+        "answer": "To file a First Information Report (FIR) in India:\n\n1. Visit the police station having jurisdiction where the crime occurred\n2. Provide details of the incident to the officer in charge (date, time, place, description of the event, names of suspects if known)\n3. The police officer must register your FIR for cognizable offenses (under Section 154 of CrPC)\n4. Review the FIR before signing it\n5. Collect a free copy of the FIR\n\nIf the police refuse to register your FIR:\n- Approach the Superintendent of Police or other higher officers\n- File a complaint to the Judicial Magistrate under Section 156(3) CrPC\n- File a complaint online on the state police portal\n\nI am an AI assistant and not a licensed legal advisor. Please consult a lawyer for serious or urgent matters."
     }
-    
-    with open('legal_knowledge_base.json', 'w') as f:
-        json.dump(legal_db, f, indent=4)
+]
 
 # Lets load Legal jargon simplification dictionary
 LEGAL_JARGON = {
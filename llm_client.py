@@ -0,0 +1,612 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:  # only needed by the async client (ASGI mode)
+    httpx = None
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+# Connection pool and deadlines (seconds)
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "32"))
+# Connections of the async client; one event loop can keep this many calls in flight
+LLM_ASYNC_POOL_SIZE = int(os.getenv("LLM_ASYNC_POOL_SIZE", "512"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+
+# Retries with jittered exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+
+# Circuit breaker: open after this many consecutive upstream failures,
+# then let a single trial request through after the reset timeout
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
+# Hedging: if the first byte hasn't arrived by this percentile of recent
+# latencies, send a duplicate request and use whichever answers first
+LLM_HEDGE = os.getenv("LLM_HEDGE", "off").lower() in ("on", "1", "true")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+# Hedges allowed per request on average, so they can't double the spend
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.05"))
+# Latencies needed before a model's percentile is trusted
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LATENCY_WINDOW = 200
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """The completion could not be produced"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LLMTimeoutError(LLMError):
+    """The upstream did not answer within the deadline"""
+
+
+class CircuitOpenError(LLMError):
+    """The upstream is considered unhealthy and calls fail fast"""
+
+
+class LLMResponse:
+    """Result of a chat completion"""
+
+    def __init__(self, data, latency):
+        self.data = data
+        self.latency = latency
+        choice = data["choices"][0] if data.get("choices") else {}
+        self.content = (choice.get("message") or {}).get("content") or ""
+        self.finish_reason = choice.get("finish_reason")
+        self.model = data.get("model")
+        self.usage = data.get("usage") or {}
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open trial -> closed"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=LLM_BREAKER_FAILURES, reset_timeout=LLM_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+class HedgeBudget:
+    """Earns `ratio` hedges per request, spends one per hedge, never saves more than `burst`"""
+
+    def __init__(self, ratio=LLM_HEDGE_BUDGET, burst=10):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = 1.0
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def spend(self):
+        with self._lock:
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            return False
+
+
+class BaseLLMClient:
+    """Settings, request building, backoff and counters shared by the sync and async clients"""
+
+    def __init__(self, api_key=None, base_url=OPENAI_BASE_URL, connect_timeout=LLM_CONNECT_TIMEOUT,
+                 read_timeout=LLM_READ_TIMEOUT, max_retries=LLM_MAX_RETRIES, breaker=None):
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = base_url.rstrip('/')
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.total_latency = 0.0
+
+    def _headers(self):
+        if not self.api_key:
+            raise LLMError("No OpenAI API key found")
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    @staticmethod
+    def _payload(messages, model, temperature, max_tokens, stream=False, **options):
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        if stream:
+            payload["stream"] = True
+        payload.update({k: v for k, v in options.items() if v is not None})
+        return payload
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after:
+            try:
+                return min(float(retry_after), LLM_BACKOFF_MAX)
+            except ValueError:
+                pass
+        # Full jitter keeps retrying workers from stampeding in lockstep
+        return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def _error_for_status(self, status_code, body):
+        """LLMError for an HTTP error response, recorded on the breaker"""
+        if status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            # Rate limited or a bad request: the upstream itself is reachable
+            self.breaker.record_success()
+        return LLMError(f"OpenAI returned {status_code}: {body}", status_code)
+
+    @staticmethod
+    def _stream_piece(line):
+        """Text carried by one server-sent event line, "" for none, None at the end"""
+        # One "data: {...}" line per chunk, then "data: [DONE]"
+        if not line or not line.startswith("data: "):
+            return ""
+        data = line[len("data: "):]
+        if data == "[DONE]":
+            return None
+        choices = json.loads(data).get("choices") or []
+        if not choices:
+            return ""
+        return (choices[0].get("delta") or {}).get("content") or ""
+
+    def stats(self):
+        with self._stats_lock:
+            succeeded = self.requests - self.failures
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "avg_latency_ms": round(self.total_latency / succeeded * 1000, 1) if succeeded else 0.0,
+                "circuit_state": self.breaker.state,
+                "circuit_opened": self.breaker.times_opened
+            }
+
+
+class LLMClient(BaseLLMClient):
+    """Single entry point for OpenAI chat completions.
+
+    One requests.Session with a pooled, keep-alive adapter is shared by all
+    threads, so TCP and TLS sessions are reused between calls. Each attempt
+    gets connect/read deadlines; 429 and 5xx responses, timeouts and
+    connection errors are retried with jittered exponential backoff, and a
+    circuit breaker makes calls fail fast while the upstream is unhealthy.
+
+    With hedging on, a request still waiting for its first byte at the
+    hedge percentile of recent latencies for its model is sent a second
+    time, within the hedge budget. The first response wins and the other
+    one is abandoned and its connection closed.
+    """
+
+    def __init__(self, api_key=None, base_url=OPENAI_BASE_URL, pool_size=LLM_POOL_SIZE,
+                 connect_timeout=LLM_CONNECT_TIMEOUT, read_timeout=LLM_READ_TIMEOUT,
+                 max_retries=LLM_MAX_RETRIES, breaker=None, hedge=LLM_HEDGE):
+        super().__init__(api_key, base_url, connect_timeout, read_timeout, max_retries, breaker)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.hedge = hedge
+        self.hedge_budget = HedgeBudget()
+        # Hedges get threads of their own: queued behind the primaries they are
+        # meant to overtake, they would start too late to help. One hedge per
+        # primary at most, so the two pools are the same size.
+        self._primary_executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="llm-primary")
+        self._hedge_executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="llm-hedge")
+        self._latencies = {}  # (model, stream) -> recent first-byte latencies
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _post(self, payload, stream=False, timeout=None, cancelled=None):
+        """POST with retries, returns the open requests.Response"""
+        url = f"{self.base_url}/chat/completions"
+        headers = self._headers()
+        read_timeout = timeout or self.read_timeout
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            if cancelled is not None and cancelled.is_set():
+                raise LLMError("Request abandoned for a faster duplicate")
+            if not self.breaker.allow():
+                raise CircuitOpenError("OpenAI circuit breaker is open")
+            retry_after = None
+            try:
+                response = self.session.post(
+                    url, headers=headers, data=json.dumps(payload), stream=stream,
+                    timeout=(self.connect_timeout, read_timeout)
+                )
+            except requests.Timeout as e:
+                self.breaker.record_failure()
+                last_error = LLMTimeoutError(f"OpenAI request timed out: {str(e)}")
+            except requests.RequestException as e:
+                self.breaker.record_failure()
+                last_error = LLMError(f"OpenAI request failed: {str(e)}")
+            else:
+                if response.status_code < 400:
+                    self.breaker.record_success()
+                    return response
+                body = response.text[:500]
+                response.close()
+                last_error = self._error_for_status(response.status_code, body)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    # Our request is wrong, retrying won't help
+                    raise last_error
+                retry_after = response.headers.get("Retry-After")
+
+            if attempt < self.max_retries:
+                self._count(retries=1)
+                time.sleep(self._backoff(attempt, retry_after))
+
+        raise last_error
+
+    def _record_latency(self, key, latency):
+        with self._stats_lock:
+            window = self._latencies.get(key)
+            if window is None:
+                window = self._latencies[key] = deque(maxlen=LATENCY_WINDOW)
+            window.append(latency)
+
+    def _hedge_delay(self, key):
+        """Seconds to wait before hedging, or None without enough history"""
+        with self._stats_lock:
+            window = self._latencies.get(key)
+            if window is None or len(window) < LLM_HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(window)
+        return ordered[min(len(ordered) - 1, int(LLM_HEDGE_PERCENTILE * len(ordered)))]
+
+    def _timed_post(self, payload, stream, timeout, key, cancelled=None):
+        start = time.monotonic()
+        response = self._post(payload, stream=stream, timeout=timeout, cancelled=cancelled)
+        if cancelled is not None and cancelled.is_set():
+            response.close()
+            raise LLMError("Request abandoned for a faster duplicate")
+        self._record_latency(key, time.monotonic() - start)
+        return response
+
+    @staticmethod
+    def _discard(future):
+        # A losing attempt that still got a response: free its connection
+        if not future.cancelled() and future.exception() is None:
+            future.result().close()
+
+    def _send(self, payload, stream=False, timeout=None):
+        """POST the request, hedged if enabled, and return the winning response"""
+        key = (payload["model"], stream)
+        delay = self._hedge_delay(key) if self.hedge else None
+        if delay is None:
+            return self._timed_post(payload, stream, timeout, key)
+
+        self.hedge_budget.earn()
+        attempts = {}
+        primary_cancel = threading.Event()
+        primary = self._primary_executor.submit(self._timed_post, payload, stream, timeout, key, primary_cancel)
+        attempts[primary] = primary_cancel
+        done, _ = wait([primary], timeout=delay)
+        if not done and self.hedge_budget.spend():
+            self._count(hedges=1)
+            hedge_cancel = threading.Event()
+            hedge = self._hedge_executor.submit(self._timed_post, payload, stream, timeout, key, hedge_cancel)
+            attempts[hedge] = hedge_cancel
+
+        pending = set(attempts)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        attempts[loser].set()
+                        loser.add_done_callback(self._discard)
+                    if future is not primary:
+                        self._count(hedge_wins=1)
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def chat_completion(self, messages, model="gpt-4", temperature=0.3, max_tokens=1000,
+                        timeout=None, **options):
+        """Return an LLMResponse for the whole completion.
+
+        Extra keyword options (response_format, stop, ...) are passed through
+        to the API. `timeout` overrides the per-attempt read deadline.
+        """
+        start = time.monotonic()
+        payload = self._payload(messages, model, temperature, max_tokens, **options)
+        try:
+            response = self._send(payload, timeout=timeout)
+            try:
+                data = response.json()
+            except ValueError:
+                raise LLMError("OpenAI returned invalid JSON")
+        except LLMError:
+            self._count(requests=1, failures=1)
+            raise
+        latency = time.monotonic() - start
+        self._count(requests=1, total_latency=latency)
+        return LLMResponse(data, latency)
+
+    def stream_chat_completion(self, messages, model="gpt-4", temperature=0.3, max_tokens=1000,
+                               timeout=None, **options):
+        """Yield pieces of the completion as they arrive.
+
+        Retries only happen before the first byte; once text has been handed
+        to the caller a failure is raised as LLMError.
+        """
+        start = time.monotonic()
+        payload = self._payload(messages, model, temperature, max_tokens, stream=True, **options)
+        try:
+            response = self._send(payload, stream=True, timeout=timeout)
+        except LLMError:
+            self._count(requests=1, failures=1)
+            raise
+
+        try:
+            with response:
+                for line in response.iter_lines(decode_unicode=True):
+                    piece = self._stream_piece(line)
+                    if piece is None:
+                        break
+                    if piece:
+                        yield piece
+        except requests.Timeout as e:
+            self.breaker.record_failure()
+            self._count(requests=1, failures=1)
+            raise LLMTimeoutError(f"OpenAI stream timed out: {str(e)}")
+        except (requests.RequestException, ValueError) as e:
+            self._count(requests=1, failures=1)
+            raise LLMError(f"OpenAI stream failed: {str(e)}")
+        self._count(requests=1, total_latency=time.monotonic() - start)
+
+    def stats(self):
+        stats = super().stats()
+        with self._stats_lock:
+            stats.update({
+                "hedging": self.hedge,
+                "hedges": self.hedges,
+                "hedge_rate": round(self.hedges / self.requests, 4) if self.requests else 0.0,
+                "hedge_win_rate": round(self.hedge_wins / self.hedges, 4) if self.hedges else 0.0
+            })
+        return stats
+
+
+class AsyncLLMClient(BaseLLMClient):
+    """asyncio counterpart of LLMClient for the ASGI serving mode.
+
+    One httpx.AsyncClient keeps up to `pool_size` keep-alive connections,
+    so a single event loop can have hundreds of completions in flight
+    without a thread per call. Deadlines, retries, backoff and the circuit
+    breaker behave as in LLMClient; requests are not hedged.
+    """
+
+    def __init__(self, api_key=None, base_url=OPENAI_BASE_URL, pool_size=LLM_ASYNC_POOL_SIZE,
+                 connect_timeout=LLM_CONNECT_TIMEOUT, read_timeout=LLM_READ_TIMEOUT,
+                 max_retries=LLM_MAX_RETRIES, breaker=None):
+        if httpx is None:
+            raise RuntimeError("The async LLM client needs httpx (pip install httpx)")
+        super().__init__(api_key, base_url, connect_timeout, read_timeout, max_retries, breaker)
+        self.pool_size = pool_size
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+        )
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _post(self, payload, stream=False, timeout=None):
+        """POST with retries, returns the open httpx.Response"""
+        url = f"{self.base_url}/chat/completions"
+        headers = self._headers()
+        deadlines = httpx.Timeout(timeout or self.read_timeout, connect=self.connect_timeout)
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError("OpenAI circuit breaker is open")
+            retry_after = None
+            try:
+                request = self.client.build_request(
+                    "POST", url, headers=headers, content=json.dumps(payload), timeout=deadlines
+                )
+                response = await self.client.send(request, stream=stream)
+            except httpx.TimeoutException as e:
+                self.breaker.record_failure()
+                last_error = LLMTimeoutError(f"OpenAI request timed out: {str(e)}")
+            except httpx.HTTPError as e:
+                self.breaker.record_failure()
+                last_error = LLMError(f"OpenAI request failed: {str(e)}")
+            else:
+                if response.status_code < 400:
+                    self.breaker.record_success()
+                    return response
+                body = (await response.aread())[:500].decode('utf-8', 'replace')
+                await response.aclose()
+                last_error = self._error_for_status(response.status_code, body)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    raise last_error
+                retry_after = response.headers.get("Retry-After")
+
+            if attempt < self.max_retries:
+                self._count(retries=1)
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+
+        raise last_error
+
+    def _started(self):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    async def chat_completion(self, messages, model="gpt-4", temperature=0.3, max_tokens=1000,
+                              timeout=None, **options):
+        """Return an LLMResponse for the whole completion, see LLMClient.chat_completion"""
+        start = time.monotonic()
+        payload = self._payload(messages, model, temperature, max_tokens, **options)
+        self._started()
+        try:
+            response = await self._post(payload, timeout=timeout)
+            try:
+                data = response.json()
+            except ValueError:
+                raise LLMError("OpenAI returned invalid JSON")
+        except LLMError:
+            self._count(requests=1, failures=1)
+            raise
+        finally:
+            self.in_flight -= 1
+        latency = time.monotonic() - start
+        self._count(requests=1, total_latency=latency)
+        return LLMResponse(data, latency)
+
+    async def stream_chat_completion(self, messages, model="gpt-4", temperature=0.3, max_tokens=1000,
+                                     timeout=None, **options):
+        """Yield pieces of the completion as they arrive, see LLMClient.stream_chat_completion"""
+        start = time.monotonic()
+        payload = self._payload(messages, model, temperature, max_tokens, stream=True, **options)
+        self._started()
+        try:
+            try:
+                response = await self._post(payload, stream=True, timeout=timeout)
+            except LLMError:
+                self._count(requests=1, failures=1)
+                raise
+
+            try:
+                async for line in response.aiter_lines():
+                    piece = self._stream_piece(line)
+                    if piece is None:
+                        break
+                    if piece:
+                        yield piece
+            except httpx.TimeoutException as e:
+                self.breaker.record_failure()
+                self._count(requests=1, failures=1)
+                raise LLMTimeoutError(f"OpenAI stream timed out: {str(e)}")
+            except (httpx.HTTPError, ValueError) as e:
+                self._count(requests=1, failures=1)
+                raise LLMError(f"OpenAI stream failed: {str(e)}")
+            finally:
+                await response.aclose()
+        finally:
+            self.in_flight -= 1
+        self._count(requests=1, total_latency=time.monotonic() - start)
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "pool_size": self.pool_size
+        })
+        return stats
+
+
+_client = None
+_client_lock = threading.Lock()
+_async_client = None
+
+
+def get_llm_client():
+    """Return the process-wide LLM client"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient()
+    return _client
+
+
+def get_async_llm_client():
+    """Return the process-wide async LLM client.
+
+    Create it from the serving event loop: httpx connections belong to the
+    loop that opened them.
+    """
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncLLMClient()
+    return _async_client
+
+
+def async_llm_stats():
+    """Stats of the async client, None unless the ASGI app is serving"""
+    client = _async_client
+    return client.stats() if client is not None else None
+
+
+async def close_async_llm_client():
+    """Close the async client's connections, at ASGI shutdown"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.client.aclose()
+        _async_client = None
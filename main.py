@@ -5,12 +5,13 @@ from datetime import timedelta
 from functools import wraps
 
 # Import from other modules
-from user_management import load_users, create_login_template
+from user_management import load_users, create_login_template, ensure_demo_account
 from api_routes import register_api_routes
+from conversation_store import ConversationStore
 from document_routes import register_document_routes
 from document_analysis import register_document_analysis_routes  # New import
 from language_utils import LANGUAGE_TRANSLATIONS
-from legal_data import legal_db, LEGAL_JARGON, LEGAL_TIMELINES, DOCUMENT_TEMPLATES
+from legal_data import LEGAL_JARGON, LEGAL_TIMELINES, DOCUMENT_TEMPLATES
 
 # Create the Flask app
 app = Flask(__name__, static_folder='static', static_url_path='/static')
@@ -20,6 +21,8 @@ load_dotenv()
 
 app.secret_key = os.getenv("SECRET_KEY", "nyaay-saathi-random-key")
 app.config['SESSION_TYPE'] = 'filesystem'
+app.config['SESSION_COOKIE_SECURE'] = os.environ.get("FLASK_DEBUG", "False").lower() != "true"
+app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)
 
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
@@ -28,8 +31,8 @@ app.config['UPLOAD_FOLDER'] = os.path.join(os.getcwd(), 'temp_uploads')
 if not os.path.exists(app.config['UPLOAD_FOLDER']):
     os.makedirs(app.config['UPLOAD_FOLDER'])
 
-# Initialize global conversation history
-conversation_history = []
+# Conversation history, kept per session
+conversations = ConversationStore()
 
 # Login required decorator
 def login_required(f):
@@ -56,10 +59,18 @@ def login_page():
 def manifest():
     return app.send_static_file('manifest.json')
 
-# Register routes from other modules
+# Register routes from other modules. Runs once per process, on import, so
+# `gunicorn main:app` serves the API routes; later calls do nothing.
+_initialized = False
+
 def initialize_app():
+    global _initialized
+    if _initialized:
+        return
+    _initialized = True
+
     # Register API routes for me
-    register_api_routes(app, conversation_history)
+    register_api_routes(app, conversations)
     
     # Register document routes
     register_document_routes(app)
@@ -69,6 +80,10 @@ def initialize_app():
     # Create template directories and files if needed
     create_login_template()
 
+    ensure_demo_account()
+
+initialize_app()
+
 
 # Run the application
 if __name__ == '__main__':
@@ -0,0 +1,172 @@
+import math
+import os
+import re
+import threading
+import time
+
+from context_builder import count_tokens
+
+ROUTER_FAST_MODEL = os.getenv("ROUTER_FAST_MODEL", "gpt-3.5-turbo")
+ROUTER_STRONG_MODEL = os.getenv("ROUTER_STRONG_MODEL", "gpt-4")
+# Messages scoring at or above this go to the strong model
+ROUTER_THRESHOLD = float(os.getenv("ROUTER_THRESHOLD", "0.6"))
+# Set MODEL_ROUTING=off to send everything to the strong model
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "on").lower() not in ("off", "0", "false")
+
+# USD per 1K prompt / completion tokens, used to estimate what routing saved
+MODEL_PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-1106-preview": (0.01, 0.03),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+
+# Words, numbers (with , / . inside) and the rupee sign, all lowercase
+WORD = re.compile(r"[a-z]+(?:'[a-z]+)?|\d[\d,/.-]*|₹")
+DATE = re.compile(r"\d{1,2}[/-]\d{1,2}[/-]\d{2,4}$")
+
+# Words that introduce a section or article number
+SECTION_WORDS = {"section", "sec", "u/s", "dhara", "article", "order", "rule"}
+# Statutes and bodies referred to by their short names
+STATUTES = {"ipc", "crpc", "cpc", "bns", "bnss", "bsa", "ndps", "pocso", "rti", "gst", "fir", "nclt", "rera", "act"}
+# Amounts and durations: the facts of someone's own case
+CURRENCY_WORDS = {"rs", "inr", "₹"}
+UNIT_WORDS = {"rupees", "lakh", "lakhs", "crore", "k", "day", "days", "week", "weeks", "month", "months",
+              "year", "years", "saal", "mahine", "din"}
+# The user describing their own situation
+PERSONAL_WORDS = {"my", "me", "mine", "i", "i'm", "i've", "we", "our", "mera", "meri", "mere", "mujhe",
+                  "maine", "hamara", "hamari", "humne"}
+# General "how does it work" questions a smaller model answers well
+PROCEDURAL_PHRASES = ("how to", "how do i", "how can i", "what is", "what are", "meaning of", "define",
+                      "step", "procedure", "process", "documents required", "documents needed",
+                      "kya hai", "kaise", "kaun sa", "kitne")
+
+# Hand-set weights of the linear score; refit from the route log if needed
+WEIGHTS = {
+    "length": 0.6,       # per log2 of (tokens / 32)
+    "references": 0.45,  # per statute or section mentioned
+    "facts": 0.35,       # per amount, date or duration
+    "personal": 0.3,     # per first-person word, capped
+    "procedural": -0.5,  # if phrased as a general how/what question
+    "questions": 0.3,    # per question mark after the first
+    "depth": 0.25,       # per earlier exchange sent as context
+}
+BIAS = -0.3
+
+
+class RouteDecision:
+    """Model chosen for one message and why"""
+
+    __slots__ = ('model', 'tier', 'score', 'features')
+
+    def __init__(self, model, tier, score, features):
+        self.model = model
+        self.tier = tier
+        self.score = score
+        self.features = features
+
+
+def message_features(message, context_turns=0):
+    """Feature values used by the routing score"""
+    text = message.lower()
+    words = WORD.findall(text)
+    references = facts = personal = 0
+    for i, word in enumerate(words):
+        following = words[i + 1] if i + 1 < len(words) else ""
+        if word in STATUTES:
+            references += 1
+        elif word in SECTION_WORDS and following[:1].isdigit():
+            references += 1
+        elif word in CURRENCY_WORDS and following[:1].isdigit():
+            facts += 1
+        elif word[0].isdigit() and (following in UNIT_WORDS or DATE.match(word)):
+            facts += 1
+        elif word in PERSONAL_WORDS:
+            personal += 1
+    return {
+        "length": max(0.0, math.log2(max(count_tokens(message), 1) / 32)),
+        "references": references,
+        "facts": facts,
+        "personal": min(personal, 4),
+        "procedural": 1 if any(phrase in text for phrase in PROCEDURAL_PHRASES) else 0,
+        "questions": max(0, message.count('?') - 1),
+        "depth": context_turns // 2,
+    }
+
+
+class ModelRouter:
+    """Sends simple questions to a fast model and complex ones to a strong one.
+
+    The decision is a linear score over a few cheap features (length,
+    legal references, case facts, first-person phrasing, how-to phrasing
+    and how deep into a conversation the message is), so routing costs
+    microseconds. Decisions, latencies and estimated savings are counted
+    per model.
+    """
+
+    def __init__(self, fast_model=ROUTER_FAST_MODEL, strong_model=ROUTER_STRONG_MODEL,
+                 threshold=ROUTER_THRESHOLD, enabled=MODEL_ROUTING):
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.threshold = threshold
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.route_seconds = 0.0
+        self.saved_usd = 0.0
+        self.models = {}
+
+    def _model_stats(self, model):
+        stats = self.models.get(model)
+        if stats is None:
+            stats = self.models[model] = {"routed": 0, "calls": 0, "latency": 0.0, "cost_usd": 0.0}
+        return stats
+
+    def route(self, message, context_turns=0):
+        start = time.perf_counter()
+        features = message_features(message, context_turns)
+        score = BIAS + sum(WEIGHTS[name] * value for name, value in features.items())
+        if not self.enabled or score >= self.threshold:
+            decision = RouteDecision(self.strong_model, "strong", score, features)
+        else:
+            decision = RouteDecision(self.fast_model, "fast", score, features)
+        with self._lock:
+            self.route_seconds += time.perf_counter() - start
+            self._model_stats(decision.model)["routed"] += 1
+        active = ", ".join(f"{name}={value:g}" for name, value in features.items() if value)
+        print(f"Model route: {decision.model} ({decision.tier}) score={score:.2f} [{active}]")
+        return decision
+
+    @staticmethod
+    def estimate_cost(model, usage):
+        prompt_price, completion_price = MODEL_PRICES.get(model, MODEL_PRICES["gpt-4"])
+        return (usage.get("prompt_tokens", 0) * prompt_price
+                + usage.get("completion_tokens", 0) * completion_price) / 1000
+
+    def record(self, decision, latency, usage=None):
+        """Record a finished call; usage is the API's token counts if known"""
+        with self._lock:
+            stats = self._model_stats(decision.model)
+            stats["calls"] += 1
+            stats["latency"] += latency
+            if usage:
+                cost = self.estimate_cost(decision.model, usage)
+                stats["cost_usd"] += cost
+                self.saved_usd += self.estimate_cost(self.strong_model, usage) - cost
+
+    def stats(self):
+        with self._lock:
+            routed = sum(s["routed"] for s in self.models.values())
+            return {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "avg_route_us": round(self.route_seconds / routed * 1e6, 1) if routed else 0.0,
+                "estimated_saved_usd": round(self.saved_usd, 4),
+                "models": {
+                    model: {
+                        "routed": s["routed"],
+                        "calls": s["calls"],
+                        "avg_latency_ms": round(s["latency"] / s["calls"] * 1000, 1) if s["calls"] else 0.0,
+                        "cost_usd": round(s["cost_usd"], 4)
+                    }
+                    for model, s in self.models.items()
+                }
+            }
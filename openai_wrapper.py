@@ -1,32 +1,30 @@
-import os
-import requests
-import json
+from llm_client import LLMClient, get_llm_client
 
-# Simple wrapper for OpenAI API to avoid client initialization issues
+# Simple wrapper for OpenAI API to avoid client initialization issues.
+# Calls go through the shared pooled LLM client (timeouts, retries, circuit breaker).
 class SimpleOpenAI:
     def __init__(self, api_key):
         self.api_key = api_key
-        self.base_url = "https://api.openai.com/v1"
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        shared = get_llm_client()
+        self.client = shared if shared.api_key == api_key else LLMClient(api_key=api_key)
     
     def chat_completions_create(self, model="gpt-4", messages=None, temperature=0.7, max_tokens=1000):
         if messages is None:
             messages = []
         
-        url = f"{self.base_url}/chat/completions"
-        payload = {
-            "model": model,
-            "messages": messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens
-        }
-        
-        response = requests.post(url, headers=self.headers, data=json.dumps(payload))
-        response.raise_for_status()
-        return SimpleResponse(response.json())
+        response = self.client.chat_completion(
+            messages, model=model, temperature=temperature, max_tokens=max_tokens
+        )
+        return SimpleResponse(response.data)
+
+    def chat_completions_stream(self, model="gpt-4", messages=None, temperature=0.7, max_tokens=1000):
+        """Yield the completion text piece by piece as the API sends it"""
+        if messages is None:
+            messages = []
+
+        yield from self.client.stream_chat_completion(
+            messages, model=model, temperature=temperature, max_tokens=max_tokens
+        )
 
 # Simple response object to match OpenAI's structure
 class SimpleResponse:
@@ -41,24 +39,3 @@ class SimpleChoice:
 class SimpleMessage:
     def __init__(self, data):
         self.content = data.get("content", "")
-
-def get_openai_client(api_key=None):
-    if api_key is None:
-        api_key = os.getenv("OPENAI_API_KEY")
-    
-    if not api_key:
-        raise ValueError("No OpenAI API key found")
-    
-    # Try to use the official client first
-    try:
-        import openai
-        try:
-            # First try the newer style
-            return openai.OpenAI(api_key=api_key)
-        except (TypeError, AttributeError):
-            # Fall back to older style
-            openai.api_key = api_key
-            return openai
-    except:
-        # If all else fails, use our simple client
-        return SimpleOpenAI(api_key)
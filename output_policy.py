@@ -0,0 +1,165 @@
+import os
+import re
+import threading
+
+# Fraction of outputs a class's budget should fit without being cut off
+OUTPUT_POLICY_PERCENTILE = float(os.getenv("OUTPUT_POLICY_PERCENTILE", "0.95"))
+# Outputs seen before a class's budget starts following its histogram
+OUTPUT_POLICY_MIN_SAMPLES = int(os.getenv("OUTPUT_POLICY_MIN_SAMPLES", "30"))
+# Set OUTPUT_POLICY=fixed to always use each class's starting budget
+OUTPUT_POLICY = os.getenv("OUTPUT_POLICY", "adaptive").lower()
+
+# Starting, lowest and highest max_tokens per query class, and the headroom
+# kept above the observed percentile
+QUERY_CLASSES = {
+    "faq": {"start": 450, "min": 200, "max": 1000, "headroom": 1.25},
+    "procedural": {"start": 700, "min": 300, "max": 1200, "headroom": 1.25},
+    "clarification": {"start": 350, "min": 150, "max": 800, "headroom": 1.25},
+    "detailed": {"start": 1000, "min": 400, "max": 1500, "headroom": 1.25},
+    # JSON is useless once cut off, so document summaries get more room
+    "document_summary": {"start": 1000, "min": 600, "max": 1500, "headroom": 1.4},
+}
+
+DISCLAIMER = ("I am an AI assistant and not a licensed legal advisor. "
+              "Please consult a lawyer for serious or urgent matters.")
+
+# Chat answers stop if the model starts writing the user's next turn. The
+# disclaimer is not a stop sequence: a model that opens with it would stop
+# before answering. finish_answer appends it when the model leaves it out.
+CHAT_STOP_SEQUENCES = ["\nUser:", "\nQuestion:"]
+
+# General "what is X" questions
+FAQ_PHRASES = ("what is", "what are", "what does", "meaning of", "define", "kya hai", "kya hota", "matlab")
+# Markup left dangling at the end of an answer, before the disclaimer is appended
+DANGLING_MARKUP = re.compile(r"\n[\s*_>-]*$")
+
+
+class LengthHistogram:
+    """Counts of output lengths in fixed-width token buckets.
+
+    Counts are halved once they pass `decay_at`, so the histogram follows
+    recent traffic instead of everything ever seen.
+    """
+
+    def __init__(self, bucket_width=25, max_tokens=4000, decay_at=2000):
+        self.bucket_width = bucket_width
+        self.counts = [0] * (max_tokens // bucket_width + 1)
+        self.total = 0
+        self.decay_at = decay_at
+
+    def add(self, tokens):
+        bucket = min(int(tokens) // self.bucket_width, len(self.counts) - 1)
+        self.counts[bucket] += 1
+        self.total += 1
+        if self.total >= self.decay_at:
+            self.counts = [count // 2 for count in self.counts]
+            self.total = sum(self.counts)
+
+    def percentile(self, fraction):
+        """Upper edge of the bucket holding the given fraction of outputs"""
+        if not self.total:
+            return 0
+        target = fraction * self.total
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return (bucket + 1) * self.bucket_width
+        return len(self.counts) * self.bucket_width
+
+
+def disclaimer_suffix(text):
+    """What has to be appended to an answer so it ends with the disclaimer"""
+    if "not a licensed legal advisor" in text:
+        return ""
+    return "\n\n" + DISCLAIMER
+
+
+def finish_answer(text):
+    """Answer with the standard disclaimer, added at the end if the model left it out"""
+    suffix = disclaimer_suffix(text)
+    if not suffix:
+        return text
+    return DANGLING_MARKUP.sub("", text.rstrip()) + suffix
+
+
+class OutputPolicy:
+    """Chooses max_tokens and stop sequences for each kind of request.
+
+    Each query class starts with a fixed budget. Once enough answers have
+    been seen, the budget becomes the configured percentile of the class's
+    recent output lengths plus headroom, within the class's limits.
+    Answers cut off by max_tokens push the budget back up.
+    """
+
+    def __init__(self, classes=QUERY_CLASSES, percentile=OUTPUT_POLICY_PERCENTILE,
+                 min_samples=OUTPUT_POLICY_MIN_SAMPLES, adaptive=OUTPUT_POLICY != "fixed"):
+        self.classes = classes
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.adaptive = adaptive
+        self._lock = threading.Lock()
+        self._histograms = {name: LengthHistogram() for name in classes}
+        self._budgets = {name: limits["start"] for name, limits in classes.items()}
+        self._truncated = {name: 0 for name in classes}
+        self._requests = {name: 0 for name in classes}
+
+    @staticmethod
+    def classify(message, route=None, context_turns=0):
+        """Query class of a chat message, using the router's features if available"""
+        features = route.features if route is not None else {}
+        text = message.lower()
+        specific = features.get("facts") or features.get("personal", 0) >= 2
+        if context_turns and len(text.split()) <= 12 and not specific and not features.get("references"):
+            return "clarification"
+        if not specific and features.get("length", 0) < 1:
+            if any(phrase in text for phrase in FAQ_PHRASES):
+                return "faq"
+            if features.get("procedural"):
+                return "procedural"
+        return "detailed"
+
+    def budget(self, query_class):
+        """Return (max_tokens, stop) for a request of this class"""
+        with self._lock:
+            self._requests[query_class] += 1
+            max_tokens = self._budgets[query_class]
+        stop = None if query_class == "document_summary" else CHAT_STOP_SEQUENCES
+        return max_tokens, stop
+
+    def record(self, query_class, completion_tokens, finish_reason=None):
+        """Feed back how long an answer was and why it ended"""
+        limits = self.classes[query_class]
+        with self._lock:
+            histogram = self._histograms[query_class]
+            histogram.add(completion_tokens)
+            if finish_reason == "length":
+                self._truncated[query_class] += 1
+            if not self.adaptive:
+                return
+            if finish_reason == "length":
+                # Cut off: the histogram only knows a lower bound, grow right away
+                budget = self._budgets[query_class] * 1.25
+            elif histogram.total >= self.min_samples:
+                budget = histogram.percentile(self.percentile) * limits["headroom"]
+            else:
+                return
+            self._budgets[query_class] = int(min(limits["max"], max(limits["min"], budget)))
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {
+                    "max_tokens": self._budgets[name],
+                    "requests": self._requests[name],
+                    "samples": self._histograms[name].total,
+                    "p50": self._histograms[name].percentile(0.5),
+                    "p95": self._histograms[name].percentile(0.95),
+                    "truncated": self._truncated[name]
+                }
+                for name in self.classes
+            }
+
+
+# Shared by chat and document analysis
+output_policy = OutputPolicy()
@@ -0,0 +1,183 @@
+import os
+import sqlite3
+import threading
+import time
+
+from response_cache import ResponseCache, RESPONSE_CACHE_TTL, response_cache
+
+# On Render, point this at a mounted persistent disk to keep the cache across deploys
+PERSISTENT_CACHE_PATH = os.getenv("PERSISTENT_CACHE_PATH", os.path.join('/tmp', 'nyaay_cache.sqlite3'))
+PERSISTENT_CACHE_MAX_ROWS = int(os.getenv("PERSISTENT_CACHE_MAX_ROWS", "100000"))
+# How many recent entries each worker loads into memory at startup
+PERSISTENT_CACHE_WARM = int(os.getenv("PERSISTENT_CACHE_WARM", "500"))
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache(expires_at);
+CREATE INDEX IF NOT EXISTS idx_cache_created ON cache(namespace, created_at);
+"""
+
+# Purge expired rows once every this many writes
+PURGE_EVERY = 200
+
+
+class PersistentCache:
+    """Key/value cache in an SQLite file shared by every gunicorn worker.
+
+    SQLite's WAL mode and busy timeout take care of locking between
+    processes. Cache failures are logged and treated as misses, so a broken
+    cache file never fails a request.
+    """
+
+    def __init__(self, path=PERSISTENT_CACHE_PATH, namespace='default', ttl=RESPONSE_CACHE_TTL,
+                 max_rows=PERSISTENT_CACHE_MAX_ROWS):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executescript(CACHE_SCHEMA)
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"Persistent cache unavailable ({self.path}): {str(e)}")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_with_expiry(self, key):
+        """Return (value, expires_at) with a wall-clock expiry, or (None, None)"""
+        try:
+            row = self._connect().execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (self.namespace, key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"Persistent cache read error: {str(e)}")
+            return None, None
+        if row is None:
+            self.misses += 1
+            return None, None
+        self.hits += 1
+        return row[0], row[1]
+
+    def get(self, key):
+        return self.get_with_expiry(key)[0]
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (namespace, key, value, created_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, value, now, expires_at)
+                )
+            self._writes += 1
+            if self._writes % PURGE_EVERY == 0:
+                self.purge()
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"Persistent cache write error: {str(e)}")
+
+    def purge(self):
+        """Drop expired rows and trim the namespace to max_rows"""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key IN ("
+                "SELECT key FROM cache WHERE namespace = ? ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.max_rows)
+            )
+
+    def recent(self, limit):
+        """Most recently written live entries as (key, value, expires_at)"""
+        try:
+            return self._connect().execute(
+                "SELECT key, value, expires_at FROM cache WHERE namespace = ? AND expires_at > ? "
+                "ORDER BY created_at DESC LIMIT ?",
+                (self.namespace, time.time(), limit)
+            ).fetchall()
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"Persistent cache read error: {str(e)}")
+            return []
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "namespace": self.namespace,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors
+        }
+
+
+class TieredCache:
+    """In-memory LRU in front of the shared on-disk cache.
+
+    Reads try memory first and promote disk hits; writes go to both tiers so
+    other workers (and the next deploy, if the file is on a persistent disk)
+    can reuse the answer.
+    """
+
+    def __init__(self, memory, disk):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        value, expires_at = self.disk.get_with_expiry(key)
+        if value is not None:
+            self.memory.set(key, value, ttl=max(0.0, expires_at - time.time()))
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.memory.set(key, value, ttl)
+        self.disk.set(key, value, ttl)
+
+    def warm(self, limit=PERSISTENT_CACHE_WARM):
+        """Load the most recent disk entries into memory, returns the count"""
+        rows = self.disk.recent(limit)
+        now = time.time()
+        # Oldest first so the newest entries end up most recently used
+        for key, value, expires_at in reversed(rows):
+            self.memory.set(key, value, ttl=max(0.0, expires_at - now))
+        return len(rows)
+
+    def stats(self):
+        return {"memory": self.memory.stats(), "disk": self.disk.stats()}
+
+
+# Chat answers and document analyses, shared across workers
+chat_cache = TieredCache(response_cache, PersistentCache(namespace='chat'))
+document_cache = TieredCache(ResponseCache(max_entries=256), PersistentCache(namespace='document'))
+
+if PERSISTENT_CACHE_WARM:
+    chat_cache.warm()
+    document_cache.warm()
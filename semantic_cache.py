@@ -0,0 +1,289 @@
+import math
+import os
+import threading
+import time
+import zlib
+from itertools import chain
+
+import numpy as np
+
+from language_utils import normalize_query_tokens, question_intent
+
+# Minimum cosine similarity for two questions to share an answer
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "100000"))
+SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "256"))
+# Below this many entries every row is scored; above it LSH picks candidates
+SEMANTIC_CACHE_EXACT_LIMIT = int(os.getenv("SEMANTIC_CACHE_EXACT_LIMIT", "8192"))
+# Legal questions share so many trigrams that LSH buckets fill up with
+# loosely related ones: only the newest rows of each bucket are looked at,
+# and of those the ones sharing the most bands with the question are scored
+SEMANTIC_CACHE_BUCKET_SCAN = int(os.getenv("SEMANTIC_CACHE_BUCKET_SCAN", "64"))
+SEMANTIC_CACHE_MAX_CANDIDATES = int(os.getenv("SEMANTIC_CACHE_MAX_CANDIDATES", "256"))
+# Knowledge-base questions the IDF weights are fitted on; a sample this size
+# estimates them well and keeps startup fast on a large knowledge base
+SEMANTIC_IDF_MAX_QUESTIONS = int(os.getenv("SEMANTIC_IDF_MAX_QUESTIONS", "2000"))
+
+# SimHash banding: LSH_BANDS bands of LSH_BITS random hyperplanes each
+LSH_BANDS = 24
+LSH_BITS = 14
+
+
+def question_features(text):
+    """Character trigrams of each normalized token, plus the token itself.
+
+    Negations, question words and modals are kept: they decide which answer is right.
+    """
+    features = []
+    for token in normalize_query_tokens(text, keep_meaning=True):
+        padded = f" {token} "
+        features.append(token)
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return features
+
+
+class QuestionVectorizer:
+    """Hashed character n-gram TF-IDF vectors.
+
+    Features are hashed into `dim` signed buckets (crc32, so every worker
+    agrees). IDF weights are fitted once on a reference corpus, normally the
+    knowledge-base questions, and stay fixed so cached vectors never go stale.
+    """
+
+    def __init__(self, dim=SEMANTIC_CACHE_DIM, corpus=()):
+        self.dim = dim
+        self.idf = np.ones(dim, dtype=np.float32)
+        if corpus:
+            self.fit_idf(corpus)
+
+    def _bucket(self, feature):
+        h = zlib.crc32(feature.encode('utf-8'))
+        return h % self.dim, (1.0 if (h >> 31) & 1 else -1.0)
+
+    def fit_idf(self, corpus):
+        df = np.zeros(self.dim, dtype=np.float32)
+        for text in corpus:
+            for bucket in {self._bucket(f)[0] for f in question_features(text)}:
+                df[bucket] += 1
+        n = len(corpus)
+        self.idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+
+    def transform(self, text):
+        """Unit-length vector for a question, or None if nothing is left after normalization"""
+        counts = {}
+        for feature in question_features(text):
+            bucket, sign = self._bucket(feature)
+            counts[bucket] = counts.get(bucket, 0.0) + sign
+        if not counts:
+            return None
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for bucket, tf in counts.items():
+            # Sublinear tf keeps repeated words from dominating
+            vector[bucket] = math.copysign(1 + math.log(abs(tf)), tf) if tf else 0.0
+        vector *= self.idf
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+
+
+class SemanticCache:
+    """Answers looked up by question similarity rather than exact text.
+
+    Vectors live in one preallocated float32 matrix used as a ring buffer,
+    so the oldest answer is overwritten once the cache is full. Small caches
+    are scored with a single matrix-vector product; larger ones first narrow
+    the rows down with SimHash LSH buckets. Each entry belongs to a variant
+    (language, simplify flag, model) and only matches lookups of that variant,
+    and only questions with the same negations, question words and modals
+    (question_intent) share an answer, however similar the rest is.
+    """
+
+    def __init__(self, vectorizer=None, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 max_entries=SEMANTIC_CACHE_MAX_ENTRIES, exact_limit=SEMANTIC_CACHE_EXACT_LIMIT,
+                 bucket_scan=SEMANTIC_CACHE_BUCKET_SCAN, max_candidates=SEMANTIC_CACHE_MAX_CANDIDATES):
+        self.vectorizer = vectorizer or QuestionVectorizer()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.exact_limit = exact_limit
+        self.bucket_scan = bucket_scan
+        self.max_candidates = max_candidates
+        dim = self.vectorizer.dim
+
+        self._capacity = min(1024, max_entries)
+        self._vectors = np.zeros((self._capacity, dim), dtype=np.float32)
+        self._variants = np.full(self._capacity, -1, dtype=np.int32)
+        self._bands = np.zeros((self._capacity, LSH_BANDS), dtype=np.int32)
+        self._answers = [None] * self._capacity
+        self._questions = [None] * self._capacity
+        self._intents = [None] * self._capacity
+        self._size = 0
+        self._next = 0
+
+        rng = np.random.default_rng(20240601)
+        self._planes = rng.standard_normal((LSH_BANDS * LSH_BITS, dim)).astype(np.float32)
+        self._powers = (1 << np.arange(LSH_BITS)).astype(np.int32)
+        # band key -> slots, oldest first; the ring always overwrites its oldest
+        # entry, so evicted slots come off the front
+        self._buckets = [dict() for _ in range(LSH_BANDS)]
+
+        self._variant_ids = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.lookup_seconds = 0.0
+
+    def _variant_id(self, variant):
+        vid = self._variant_ids.get(variant)
+        if vid is None:
+            vid = self._variant_ids[variant] = len(self._variant_ids)
+        return vid
+
+    def _band_keys(self, vector):
+        bits = (self._planes @ vector > 0).reshape(LSH_BANDS, LSH_BITS)
+        return bits.astype(np.int32) @ self._powers
+
+    def _grow(self):
+        new_capacity = min(self._capacity * 2, self.max_entries)
+        extra = new_capacity - self._capacity
+        self._vectors = np.vstack([self._vectors, np.zeros((extra, self._vectors.shape[1]), dtype=np.float32)])
+        self._variants = np.concatenate([self._variants, np.full(extra, -1, dtype=np.int32)])
+        self._bands = np.vstack([self._bands, np.zeros((extra, LSH_BANDS), dtype=np.int32)])
+        self._answers.extend([None] * extra)
+        self._questions.extend([None] * extra)
+        self._intents.extend([None] * extra)
+        self._capacity = new_capacity
+
+    def _candidates(self, band_keys):
+        """Rows sharing an LSH bucket with the question: the newest bucket_scan
+        of each bucket, then at most max_candidates of those, preferring rows
+        that share more bands"""
+        buckets = [
+            self._buckets[band].get(int(key), ())[-self.bucket_scan:] for band, key in enumerate(band_keys)
+        ]
+        total = sum(len(bucket) for bucket in buckets)
+        rows = np.fromiter(chain.from_iterable(buckets), dtype=np.int64, count=total)
+        rows, shared = np.unique(rows, return_counts=True)
+        if len(rows) > self.max_candidates:
+            rows = rows[np.argpartition(-shared, self.max_candidates - 1)[:self.max_candidates]]
+        return rows
+
+    def lookup(self, question, variant, threshold=None):
+        """Return (answer, similarity) for the closest cached question, or (None, score)"""
+        threshold = self.threshold if threshold is None else threshold
+        start = time.perf_counter()
+        vector = self.vectorizer.transform(question)
+        intent = question_intent(question)
+        with self._lock:
+            best_score, answer = 0.0, None
+            vid = self._variant_ids.get(variant)
+            if vector is not None and vid is not None and self._size:
+                if self._size <= self.exact_limit:
+                    rows = np.arange(self._size)
+                    scores = self._vectors[:self._size] @ vector
+                else:
+                    rows = self._candidates(self._band_keys(vector))
+                    scores = self._vectors[rows] @ vector if len(rows) else np.zeros(0, dtype=np.float32)
+                if len(rows):
+                    scores = np.where(self._variants[rows] == vid, scores, -1.0)
+                    best_score = float(scores.max())
+                    # Most similar first, skipping questions that ask something else
+                    above = np.flatnonzero(scores >= threshold)
+                    for best in above[np.argsort(-scores[above], kind='stable')]:
+                        if self._intents[rows[best]] == intent:
+                            answer = self._answers[rows[best]]
+                            break
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self.lookup_seconds += time.perf_counter() - start
+        return answer, best_score
+
+    def add(self, question, variant, answer):
+        vector = self.vectorizer.transform(question)
+        if vector is None:
+            return
+        band_keys = self._band_keys(vector)
+        with self._lock:
+            if self._next == self._capacity and self._capacity < self.max_entries:
+                self._grow()
+            slot = self._next
+            if self._answers[slot] is not None:
+                # Overwriting the oldest entry, drop it from its LSH buckets
+                for band, key in enumerate(self._bands[slot]):
+                    bucket = self._buckets[band].get(int(key))
+                    if bucket is not None:
+                        if bucket[0] == slot:
+                            del bucket[0]
+                        else:
+                            bucket.remove(slot)
+                        if not bucket:
+                            del self._buckets[band][int(key)]
+            else:
+                self._size += 1
+            self._vectors[slot] = vector
+            self._variants[slot] = self._variant_id(variant)
+            self._bands[slot] = band_keys
+            for band, key in enumerate(band_keys):
+                self._buckets[band].setdefault(int(key), []).append(slot)
+            self._answers[slot] = answer
+            self._questions[slot] = question
+            self._intents[slot] = question_intent(question)
+            self._next = (slot + 1) % self.max_entries
+
+    def __len__(self):
+        return self._size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "avg_lookup_ms": round(self.lookup_seconds / lookups * 1000, 4) if lookups else 0.0
+        }
+
+
+# (cached question, asked question, should share the answer); run
+# python semantic_cache.py after changing the normalizer or the threshold
+SEMANTIC_CACHE_REGRESSIONS = [
+    ("How do I file an FIR?", "how to lodge an FIR", True),
+    ("How do I file an FIR?", "FIR kaise file kare", True),
+    ("What are my rights as a tenant?", "what are the rights of a tenant", True),
+    ("is it legal for police to arrest me", "is it not legal for police to arrest me", False),
+    ("can landlord evict me without notice", "can landlord evict me with notice", False),
+    ("how to file FIR", "when to file FIR", False),
+    ("how to file FIR", "why file FIR", False),
+    ("how to file FIR", "should I file FIR", False),
+    ("how to file an FIR", "how to register a company", False),
+    ("can police arrest me without a warrant", "police warrant ke bina arrest kar sakti hai", True),
+]
+
+
+def check_regressions(cases=SEMANTIC_CACHE_REGRESSIONS, threshold=SEMANTIC_CACHE_THRESHOLD, corpus=()):
+    """Cases the cache gets wrong, as (cached, asked, expected, similarity)"""
+    failures = []
+    for cached, asked, expected in cases:
+        cache = SemanticCache(QuestionVectorizer(corpus=corpus), threshold=threshold)
+        cache.add(cached, "check", "answer")
+        answer, similarity = cache.lookup(asked, "check")
+        if (answer is not None) != expected:
+            failures.append((cached, asked, expected, round(similarity, 3)))
+    return failures
+
+
+if __name__ == '__main__':
+    import json
+    from kb_manager import KB_SOURCE_PATH
+
+    # IDF fitted on the knowledge-base questions, as in api_routes
+    with open(KB_SOURCE_PATH, 'r', encoding='utf-8') as f:
+        corpus = [qa_pair["question"] for qa_pair in json.load(f)["legal_qa_pairs"][:SEMANTIC_IDF_MAX_QUESTIONS]]
+    failures = check_regressions(corpus=corpus)
+    for failure in failures:
+        print("FAIL cached=%r asked=%r expected_hit=%s similarity=%s" % failure)
+    print(f"{len(SEMANTIC_CACHE_REGRESSIONS) - len(failures)}/{len(SEMANTIC_CACHE_REGRESSIONS)} semantic cache checks passed")
+    raise SystemExit(1 if failures else 0)
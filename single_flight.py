@@ -0,0 +1,194 @@
+import asyncio
+import errno
+import fcntl
+import os
+import threading
+import time
+
+# Set to a directory shared by the gunicorn workers to coalesce across processes too
+SINGLE_FLIGHT_LOCK_DIR = os.getenv("SINGLE_FLIGHT_LOCK_DIR", "")
+# How long a waiting request trusts someone else's call before making its own
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", "90"))
+
+# How often a worker polls a lock file held by another worker
+LOCK_POLL_INTERVAL = 0.05
+
+
+class _Call:
+    """One in-flight call and the threads waiting for it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one.
+
+    The first thread to ask for a key runs the function; threads asking for
+    the same key meanwhile wait and get its result (or its exception).
+
+    With a lock directory, the running thread also takes an flock on a
+    per-key file so only one worker calls upstream. A worker that had to
+    wait for the lock runs `recheck` first, which normally finds the answer
+    the other worker just cached.
+    """
+
+    def __init__(self, lock_dir=SINGLE_FLIGHT_LOCK_DIR, timeout=SINGLE_FLIGHT_TIMEOUT):
+        self.lock_dir = lock_dir
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.shared = 0
+        self.cross_worker_shared = 0
+        self.timeouts = 0
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def do(self, key, fn, recheck=None):
+        """Return fn() for this key, sharing the result with concurrent callers"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+
+        if not leader:
+            if call.done.wait(self.timeout):
+                with self._lock:
+                    self.shared += 1
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            # The leader is stuck, don't make this request wait any longer
+            with self._lock:
+                self.timeouts += 1
+            return fn()
+
+        try:
+            call.result = self._run(key, fn, recheck)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def _run(self, key, fn, recheck):
+        if not self.lock_dir:
+            return fn()
+        fd, waited = self._acquire_file_lock(key)
+        try:
+            if waited and recheck is not None:
+                result = recheck()
+                if result is not None:
+                    with self._lock:
+                        self.cross_worker_shared += 1
+                    return result
+            return fn()
+        finally:
+            if fd is not None:
+                self._release_file_lock(key, fd)
+
+    def _lock_path(self, key):
+        return os.path.join(self.lock_dir, f"{key}.lock")
+
+    def _acquire_file_lock(self, key):
+        """Return (fd, waited). fd is None if the lock could not be had in time"""
+        path = self._lock_path(key)
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        while True:
+            try:
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            except OSError as e:
+                print(f"Single-flight lock unavailable ({path}): {str(e)}")
+                return None, waited
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError as e:
+                os.close(fd)
+                if e.errno not in (errno.EAGAIN, errno.EACCES):
+                    print(f"Single-flight lock error ({path}): {str(e)}")
+                    return None, waited
+                waited = True
+                if time.monotonic() >= deadline:
+                    with self._lock:
+                        self.timeouts += 1
+                    return None, waited
+                time.sleep(LOCK_POLL_INTERVAL)
+                continue
+            # The previous holder unlinks the file when done; if we locked a
+            # file that is no longer at the path, start over on the new one
+            try:
+                if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                    return fd, waited
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+            waited = True
+
+    def _release_file_lock(self, key, fd):
+        try:
+            os.unlink(self._lock_path(key))
+        except FileNotFoundError:
+            pass
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "shared": self.shared,
+                "cross_worker_shared": self.cross_worker_shared,
+                "timeouts": self.timeouts,
+                "lock_dir": self.lock_dir or None
+            }
+
+
+class AsyncSingleFlight:
+    """Collapse concurrent coroutine calls for the same key into one task.
+
+    The first caller for a key starts `fn()` as a task; callers asking for
+    the same key while it runs get that same task. Callers should await it
+    through asyncio.shield so one of them giving up (a deadline, a closed
+    connection) doesn't cancel the call for the others.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def task(self, key, fn):
+        """Return the running task for key, starting fn() if there is none"""
+        task = self._tasks.get(key)
+        if task is not None:
+            self.shared += 1
+            return task
+        task = self._tasks[key] = asyncio.ensure_future(fn())
+        self.leaders += 1
+        task.add_done_callback(lambda done: self._finished(key, done))
+        return task
+
+    def _finished(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled() and task.exception() is not None:
+            # Retrieved here so an error nobody waited for isn't logged as never retrieved
+            print(f"Single-flight call failed: {str(task.exception())}")
+
+    def stats(self):
+        return {
+            "in_flight": len(self._tasks),
+            "leaders": self.leaders,
+            "shared": self.shared
+        }
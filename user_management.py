@@ -1,34 +1,39 @@
-import json
 import os
 import uuid
 from datetime import datetime
 from flask import jsonify, request, session
 from werkzeug.security import generate_password_hash, check_password_hash
 
-# Constants
-# Constants
-# Use /tmp directory on Render which is writable
-USER_DB_FILE = os.path.join('/tmp', 'user_db.json')
-# User database functions
+from user_store import (
+    USER_DB_FILE, CHAT_PAGE_SIZE, CHAT_PAGE_SIZE_MAX, JSONUserStore, get_user_store
+)
+
+# User database functions (legacy whole-file JSON database)
 def load_users():
     """Load user data from the database file"""
-    if os.path.exists(USER_DB_FILE):
-        try:
-            with open(USER_DB_FILE, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            # If file is corrupted or can't be read, create a new one
-            pass
-    
-    # Create default user database if file doesn't exist
-    users = {'users': {}}
-    save_users(users)
-    return users
+    return JSONUserStore(USER_DB_FILE).load_users()
     
 def save_users(users):
     """Save user data to the database file"""
-    with open(USER_DB_FILE, 'w') as f:
-        json.dump(users, f, indent=4)
+    JSONUserStore(USER_DB_FILE).save_users(users)
+
+def ensure_demo_account():
+    """Create the demo account if it doesn't exist yet"""
+    store = get_user_store()
+    demo_email = 'demo@nyaaysaathi.com'
+    
+    if not store.get_user(demo_email):
+        print("Creating demo account...")
+        created = store.create_user({
+            'id': str(uuid.uuid4()),
+            'name': 'Demo User',
+            'email': demo_email,
+            'password': generate_password_hash('demo123'),
+            'created_at': datetime.now().isoformat(),
+            'last_login': datetime.now().isoformat()
+        })
+        if created:
+            print("Demo account created!")
 
 def create_login_template():
     """Create the login.html template if it doesn't exist"""
@@ -185,18 +190,17 @@ def handle_login():
         email = data.get('email', '').lower()
         password = data.get('password', '')
         
-        users = load_users()
+        store = get_user_store()
+        user = store.get_user(email)
         
-        if email in users['users'] and check_password_hash(users['users'][email]['password'], password):
-            user = users['users'][email]
+        if user and check_password_hash(user['password'], password):
             session['user_id'] = user['id']
             session['user_email'] = email
             session['user_name'] = user['name']
             session.permanent = True  # Make session persistent
             
             # Update last login
-            users['users'][email]['last_login'] = datetime.now().isoformat()
-            save_users(users)
+            store.update_last_login(email, datetime.now().isoformat())
             
             return jsonify({'success': True, 'message': 'Login successful'})
         
@@ -219,24 +223,24 @@ def handle_register():
     if len(password) < 6:
         return jsonify({'success': False, 'message': 'Password must be at least 6 characters'}), 400
     
-    users = load_users()
+    store = get_user_store()
     
-    if email in users['users']:
+    if store.get_user(email):
         return jsonify({'success': False, 'message': 'Email already registered'}), 400
     
     # Create new user
     user_id = str(uuid.uuid4())
-    users['users'][email] = {
+    created = store.create_user({
         'id': user_id,
         'name': name,
         'email': email,
         'password': generate_password_hash(password),
         'created_at': datetime.now().isoformat(),
-        'last_login': datetime.now().isoformat(),
-        'chat_history': []
-    }
+        'last_login': datetime.now().isoformat()
+    })
     
-    save_users(users)
+    if not created:
+        return jsonify({'success': False, 'message': 'Email already registered'}), 400
     
     # Auto login
     session['user_id'] = user_id
@@ -271,7 +275,6 @@ def handle_save_chat():
     data = request.json
     chat_messages = data.get('messages', [])
     
-    users = load_users()
     email = session['user_email']
     
     chat_id = str(uuid.uuid4())
@@ -282,21 +285,41 @@ def handle_save_chat():
         'messages': chat_messages
     }
     
-    users['users'][email]['chat_history'].append(chat_data)
-    save_users(users)
+    get_user_store().add_chat(email, chat_data)
     
     return jsonify({'success': True, 'chat_id': chat_id})
 
 def handle_get_chat_history():
-    """Handle get chat history API request"""
+    """Handle get chat history API request
+    
+    With ?view=summary only id, title and timestamp are returned, newest first,
+    one page at a time (limit, cursor) and optionally only chats saved after
+    ?since=<timestamp>. Full messages are then loaded through /api/chat/<chat_id>.
+    """
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Not logged in'}), 401
     
-    users = load_users()
     email = session['user_email']
     
-    if email in users['users']:
-        chats = users['users'][email]['chat_history']
+    if request.args.get('view') == 'summary':
+        try:
+            limit = int(request.args.get('limit', CHAT_PAGE_SIZE))
+            limit = max(1, min(limit, CHAT_PAGE_SIZE_MAX))
+            chats, next_cursor = get_user_store().list_chat_summaries(
+                email, limit=limit,
+                cursor=request.args.get('cursor'),
+                since=request.args.get('since')
+            )
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid pagination parameters'}), 400
+        
+        if chats is None:
+            return jsonify({'success': False, 'message': 'User not found'}), 404
+        return jsonify({'success': True, 'chats': chats, 'next_cursor': next_cursor})
+    
+    chats = get_user_store().list_chats(email)
+    
+    if chats is not None:
         return jsonify({'success': True, 'chats': chats})
     
     return jsonify({'success': False, 'message': 'User not found'}), 404
@@ -306,13 +329,11 @@ def handle_get_chat(chat_id):
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Not logged in'}), 401
     
-    users = load_users()
     email = session['user_email']
+    chat = get_user_store().get_chat(email, chat_id)
     
-    if email in users['users']:
-        for chat in users['users'][email]['chat_history']:
-            if chat['id'] == chat_id:
-                return jsonify({'success': True, 'chat': chat})
+    if chat:
+        return jsonify({'success': True, 'chat': chat})
     
     return jsonify({'success': False, 'message': 'Chat not found'}), 404
 
@@ -321,14 +342,9 @@ def handle_delete_chat(chat_id):
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Not logged in'}), 401
     
-    users = load_users()
     email = session['user_email']
     
-    if email in users['users']:
-        users['users'][email]['chat_history'] = [
-            chat for chat in users['users'][email]['chat_history'] if chat['id'] != chat_id
-        ]
-        save_users(users)
+    if get_user_store().delete_chat(email, chat_id):
         return jsonify({'success': True, 'message': 'Chat deleted'})
     
     return jsonify({'success': False, 'message': 'User not found'}), 404
@@ -0,0 +1,690 @@
+import base64
+import fcntl
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Use /tmp directory on Render which is writable
+USER_DB_FILE = os.path.join('/tmp', 'user_db.json')
+USER_DB_SQLITE = os.getenv("USER_DB_PATH", os.path.join('/tmp', 'user_db.sqlite3'))
+
+# Which backend the handlers should use: "sqlite" (default), "journal" or "json"
+USER_DB_BACKEND = os.getenv("USER_DB_BACKEND", "sqlite").lower()
+
+# Page size limits for the summary chat listing
+CHAT_PAGE_SIZE = 20
+CHAT_PAGE_SIZE_MAX = 100
+
+
+def encode_cursor(chat):
+    """Opaque pagination cursor pointing just after the given chat"""
+    raw = json.dumps([chat['timestamp'], chat['id']]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, chat_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return timestamp or '', chat_id
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def chat_summary(chat):
+    return {'id': chat['id'], 'title': chat.get('title'), 'timestamp': chat.get('timestamp')}
+
+
+def paginate_summaries(chats, limit, cursor=None, since=None):
+    """Newest-first page of chat summaries from an in-memory list of chats.
+
+    Chats are ordered by (timestamp, id). `cursor` continues after the last
+    chat of the previous page and `since` keeps only chats saved after that
+    timestamp. Returns (summaries, next_cursor).
+    """
+    after = decode_cursor(cursor) if cursor else None
+    selected = []
+    for chat in chats:
+        key = (chat.get('timestamp') or '', chat['id'])
+        if since and key[0] <= since:
+            continue
+        if after and key >= after:
+            continue
+        selected.append(chat)
+    selected.sort(key=lambda chat: (chat.get('timestamp') or '', chat['id']), reverse=True)
+    page = selected[:limit]
+    next_cursor = encode_cursor(page[-1]) if len(selected) > limit else None
+    return [chat_summary(chat) for chat in page], next_cursor
+
+
+class UserStore:
+    """Interface shared by all user/chat storage backends.
+
+    Users are looked up by email. User records returned by the store never
+    include the chat history; chats are read and written one at a time.
+    """
+
+    def get_user(self, email):
+        raise NotImplementedError
+
+    def create_user(self, user):
+        """Insert a new user, returns False if the email is already taken"""
+        raise NotImplementedError
+
+    def update_last_login(self, email, timestamp):
+        raise NotImplementedError
+
+    def add_chat(self, email, chat):
+        raise NotImplementedError
+
+    def list_chats(self, email):
+        """Return the user's chats in save order, or None if the user is unknown"""
+        raise NotImplementedError
+
+    def list_chat_summaries(self, email, limit=CHAT_PAGE_SIZE, cursor=None, since=None):
+        """Newest-first page of {id, title, timestamp} without messages.
+
+        Returns (summaries, next_cursor), or (None, None) if the user is unknown.
+        """
+        chats = self.list_chats(email)
+        if chats is None:
+            return None, None
+        return paginate_summaries(chats, limit, cursor, since)
+
+    def get_chat(self, email, chat_id):
+        raise NotImplementedError
+
+    def delete_chat(self, email, chat_id):
+        """Delete one chat, returns False if the user is unknown"""
+        raise NotImplementedError
+
+
+#==========================================================================
+# JSON file backend (original whole-file database)
+#==========================================================================
+class JSONUserStore(UserStore):
+    """Keeps every user in one JSON file that is rewritten on each change"""
+
+    def __init__(self, path=USER_DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load_users(self):
+        """Load user data from the database file"""
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, IOError):
+                # If file is corrupted or can't be read, create a new one
+                pass
+
+        # Create default user database if file doesn't exist
+        users = {'users': {}}
+        self.save_users(users)
+        return users
+
+    def save_users(self, users):
+        """Save user data to the database file"""
+        with open(self.path, 'w') as f:
+            json.dump(users, f, indent=4)
+
+    def get_user(self, email):
+        user = self.load_users()['users'].get(email)
+        if user is None:
+            return None
+        return {k: v for k, v in user.items() if k != 'chat_history'}
+
+    def create_user(self, user):
+        with self._lock:
+            users = self.load_users()
+            if user['email'] in users['users']:
+                return False
+            users['users'][user['email']] = dict(user, chat_history=[])
+            self.save_users(users)
+            return True
+
+    def update_last_login(self, email, timestamp):
+        with self._lock:
+            users = self.load_users()
+            if email in users['users']:
+                users['users'][email]['last_login'] = timestamp
+                self.save_users(users)
+
+    def add_chat(self, email, chat):
+        with self._lock:
+            users = self.load_users()
+            users['users'][email]['chat_history'].append(chat)
+            self.save_users(users)
+
+    def list_chats(self, email):
+        user = self.load_users()['users'].get(email)
+        if user is None:
+            return None
+        return user['chat_history']
+
+    def get_chat(self, email, chat_id):
+        for chat in self.list_chats(email) or []:
+            if chat['id'] == chat_id:
+                return chat
+        return None
+
+    def delete_chat(self, email, chat_id):
+        with self._lock:
+            users = self.load_users()
+            if email not in users['users']:
+                return False
+            users['users'][email]['chat_history'] = [
+                chat for chat in users['users'][email]['chat_history'] if chat['id'] != chat_id
+            ]
+            self.save_users(users)
+            return True
+
+
+#==========================================================================
+# SQLite backend
+#==========================================================================
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    password TEXT NOT NULL,
+    created_at TEXT,
+    last_login TEXT
+);
+CREATE TABLE IF NOT EXISTS chats (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    title TEXT,
+    timestamp TEXT,
+    messages TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chats_user ON chats(user_id, timestamp, id);
+"""
+
+USER_COLUMNS = ('id', 'email', 'name', 'password', 'created_at', 'last_login')
+
+
+class SQLiteUserStore(UserStore):
+    """Embedded SQLite database, one row per user and one row per chat.
+
+    Every call touches only the rows of a single user, so its cost does not
+    grow with the total number of users or chats. The database runs in WAL
+    mode so readers in other gunicorn workers are never blocked by a writer.
+    """
+
+    def __init__(self, path=USER_DB_SQLITE):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        with conn:
+            conn.executescript(SQLITE_SCHEMA)
+
+    def _connect(self):
+        # sqlite3 connections can't be shared between threads, keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _chat_from_row(row):
+        return {
+            'id': row['id'],
+            'title': row['title'],
+            'timestamp': row['timestamp'],
+            'messages': json.loads(row['messages'])
+        }
+
+    def _user_id(self, conn, email):
+        row = conn.execute("SELECT id FROM users WHERE email = ?", (email,)).fetchone()
+        return row['id'] if row else None
+
+    def get_user(self, email):
+        row = self._connect().execute(
+            "SELECT id, email, name, password, created_at, last_login FROM users WHERE email = ?",
+            (email,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def create_user(self, user):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO users (id, email, name, password, created_at, last_login) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    tuple(user.get(column) for column in USER_COLUMNS)
+                )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def update_last_login(self, email, timestamp):
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE users SET last_login = ? WHERE email = ?", (timestamp, email))
+
+    def add_chat(self, email, chat):
+        conn = self._connect()
+        with conn:
+            user_id = self._user_id(conn, email)
+            if user_id is None:
+                raise KeyError(email)
+            conn.execute(
+                "INSERT INTO chats (id, user_id, title, timestamp, messages) VALUES (?, ?, ?, ?, ?)",
+                (chat['id'], user_id, chat.get('title'), chat.get('timestamp'),
+                 json.dumps(chat.get('messages', [])))
+            )
+
+    def list_chats(self, email):
+        conn = self._connect()
+        user_id = self._user_id(conn, email)
+        if user_id is None:
+            return None
+        rows = conn.execute(
+            "SELECT id, title, timestamp, messages FROM chats WHERE user_id = ? "
+            "ORDER BY timestamp, rowid",
+            (user_id,)
+        ).fetchall()
+        return [self._chat_from_row(row) for row in rows]
+
+    def list_chat_summaries(self, email, limit=CHAT_PAGE_SIZE, cursor=None, since=None):
+        conn = self._connect()
+        user_id = self._user_id(conn, email)
+        if user_id is None:
+            return None, None
+
+        # Walks idx_chats_user backwards and never reads the messages column
+        query = "SELECT id, title, timestamp FROM chats WHERE user_id = ?"
+        params = [user_id]
+        if since:
+            query += " AND timestamp > ?"
+            params.append(since)
+        if cursor:
+            query += " AND (timestamp, id) < (?, ?)"
+            params.extend(decode_cursor(cursor))
+        query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = conn.execute(query, params).fetchall()
+        summaries = [dict(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(summaries[-1]) if len(rows) > limit else None
+        return summaries, next_cursor
+
+    def get_chat(self, email, chat_id):
+        row = self._connect().execute(
+            "SELECT c.id, c.title, c.timestamp, c.messages FROM chats c "
+            "JOIN users u ON u.id = c.user_id WHERE c.id = ? AND u.email = ?",
+            (chat_id, email)
+        ).fetchone()
+        return self._chat_from_row(row) if row else None
+
+    def delete_chat(self, email, chat_id):
+        conn = self._connect()
+        with conn:
+            user_id = self._user_id(conn, email)
+            if user_id is None:
+                return False
+            conn.execute("DELETE FROM chats WHERE id = ? AND user_id = ?", (chat_id, user_id))
+            return True
+
+    def is_empty(self):
+        return self._connect().execute("SELECT 1 FROM users LIMIT 1").fetchone() is None
+
+    def import_users(self, users):
+        """Bulk insert users (with their chat_history) in one transaction.
+
+        Existing users and chats are left untouched, so importing the same
+        data twice is harmless. Returns (users_imported, chats_imported).
+        """
+        conn = self._connect()
+        user_count = chat_count = 0
+        with conn:
+            for email, user in users.items():
+                user = dict(user, email=user.get('email', email))
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO users (id, email, name, password, created_at, last_login) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    tuple(user.get(column) for column in USER_COLUMNS)
+                )
+                user_count += cursor.rowcount
+                user_id = self._user_id(conn, user['email'])
+                for chat in user.get('chat_history', []):
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO chats (id, user_id, title, timestamp, messages) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (chat['id'], user_id, chat.get('title'), chat.get('timestamp'),
+                         json.dumps(chat.get('messages', [])))
+                    )
+                    chat_count += cursor.rowcount
+        return user_count, chat_count
+
+
+def migrate_json_to_sqlite(json_path=USER_DB_FILE, db_path=USER_DB_SQLITE):
+    """One-shot migration of the legacy JSON user database into SQLite"""
+    with open(json_path, 'r') as f:
+        users = json.load(f).get('users', {})
+    return SQLiteUserStore(db_path).import_users(users)
+
+
+#==========================================================================
+# Append-only journal backend
+#==========================================================================
+USER_DB_JOURNAL_DIR = os.getenv("USER_DB_JOURNAL_DIR", os.path.join('/tmp', 'user_db_journal'))
+JOURNAL_FSYNC_INTERVAL = float(os.getenv("JOURNAL_FSYNC_INTERVAL", "0.05"))
+JOURNAL_FSYNC_BATCH = int(os.getenv("JOURNAL_FSYNC_BATCH", "64"))
+JOURNAL_COMPACT_INTERVAL = float(os.getenv("JOURNAL_COMPACT_INTERVAL", "60"))
+JOURNAL_COMPACT_BYTES = int(os.getenv("JOURNAL_COMPACT_BYTES", str(4 * 1024 * 1024)))
+
+
+class JournalUserStore(UserStore):
+    """Snapshot plus append-only log of changes.
+
+    Every write appends one JSON line to journal.log, so saving or deleting a
+    chat costs O(size of that chat) instead of rewriting the whole database.
+    fsync is batched: a background thread syncs the log every
+    JOURNAL_FSYNC_INTERVAL seconds, or inline once JOURNAL_FSYNC_BATCH records
+    are pending. A second background thread folds the log into snapshot.json
+    once it grows past JOURNAL_COMPACT_BYTES.
+
+    A crash can at worst leave a truncated last line, which replay skips; the
+    snapshot is only ever replaced atomically. Other gunicorn workers pick up
+    new records by tailing the log, and an flock on journal.lock keeps
+    compaction from racing with appends and reloads.
+    """
+
+    def __init__(self, directory=USER_DB_JOURNAL_DIR, seed_file=None, background=True):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.snapshot_path = os.path.join(directory, 'snapshot.json')
+        self.log_path = os.path.join(directory, 'journal.log')
+        self._lock = threading.RLock()
+        self._lock_fd = os.open(os.path.join(directory, 'journal.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        self._log_fd = None
+        self._users = {}
+        self._inode = None
+        self._offset = 0
+        self._pending_sync = 0
+
+        with self._file_lock(fcntl.LOCK_EX):
+            # Start from the legacy JSON database if there's nothing here yet
+            if not os.path.exists(self.snapshot_path) and seed_file and os.path.exists(seed_file):
+                try:
+                    with open(seed_file, 'r') as f:
+                        self._write_snapshot(json.load(f))
+                    print(f"Seeded user journal from {seed_file}")
+                except (json.JSONDecodeError, IOError) as e:
+                    print(f"Could not seed user journal from {seed_file}: {str(e)}")
+            self._open_log()
+            # Terminate a line torn by a crash so the next append starts clean
+            size = os.fstat(self._log_fd).st_size
+            if size:
+                with open(self.log_path, 'rb') as f:
+                    f.seek(size - 1)
+                    if f.read(1) != b'\n':
+                        os.write(self._log_fd, b'\n')
+            self._reload()
+
+        if background:
+            threading.Thread(target=self._sync_loop, daemon=True).start()
+            threading.Thread(target=self._compact_loop, daemon=True).start()
+
+    # -- file handling -----------------------------------------------------
+
+    @contextmanager
+    def _file_lock(self, mode):
+        fcntl.flock(self._lock_fd, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _open_log(self):
+        if self._log_fd is not None:
+            os.close(self._log_fd)
+        self._log_fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _write_snapshot(self, data):
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _reload(self):
+        """Rebuild in-memory state from the snapshot and the whole log"""
+        users = {}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r') as f:
+                for email, user in json.load(f).get('users', {}).items():
+                    chats = user.get('chat_history', [])
+                    user = {k: v for k, v in user.items() if k != 'chat_history'}
+                    user['chats'] = {chat['id']: chat for chat in chats}
+                    users[email] = user
+        self._users = users
+        self._inode = os.stat(self.log_path).st_ino
+        self._offset = 0
+        self._read_log()
+
+    def _read_log(self):
+        with open(self.log_path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        # Only complete lines; a partial record is picked up on the next call
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                self._apply(json.loads(line))
+            except (ValueError, KeyError, TypeError):
+                # Torn or otherwise unreadable record
+                continue
+        self._offset += end
+
+    def _refresh(self):
+        """Catch up with records written by this or any other process"""
+        with self._lock:
+            stat = os.stat(self.log_path)
+            if stat.st_ino != self._inode:
+                # Log was compacted by another process
+                with self._file_lock(fcntl.LOCK_SH):
+                    self._reload()
+                self._open_log()
+            elif stat.st_size > self._offset:
+                self._read_log()
+
+    def _append(self, record):
+        line = (json.dumps(record) + '\n').encode('utf-8')
+        with self._lock:
+            with self._file_lock(fcntl.LOCK_SH):
+                if os.fstat(self._log_fd).st_ino != os.stat(self.log_path).st_ino:
+                    self._open_log()
+                os.write(self._log_fd, line)
+            self._pending_sync += 1
+            if self._pending_sync >= JOURNAL_FSYNC_BATCH:
+                self._sync()
+            self._refresh()
+
+    def _sync(self):
+        with self._lock:
+            if self._pending_sync:
+                os.fsync(self._log_fd)
+                self._pending_sync = 0
+
+    def _sync_loop(self):
+        while True:
+            time.sleep(JOURNAL_FSYNC_INTERVAL)
+            try:
+                self._sync()
+            except OSError as e:
+                print(f"Journal fsync error: {str(e)}")
+
+    def _compact_loop(self):
+        while True:
+            time.sleep(JOURNAL_COMPACT_INTERVAL)
+            try:
+                if os.stat(self.log_path).st_size >= JOURNAL_COMPACT_BYTES:
+                    self.compact()
+            except OSError as e:
+                print(f"Journal compaction error: {str(e)}")
+
+    def compact(self):
+        """Fold the log into a new snapshot and start an empty log"""
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            self._refresh_locked()
+            self._write_snapshot(self.export_users())
+            tmp_path = self.log_path + '.tmp'
+            open(tmp_path, 'wb').close()
+            os.replace(tmp_path, self.log_path)
+            self._open_log()
+            self._pending_sync = 0
+            self._inode = os.stat(self.log_path).st_ino
+            self._offset = 0
+
+    def _refresh_locked(self):
+        # Same as _refresh but for callers already holding the file lock
+        if os.stat(self.log_path).st_ino != self._inode:
+            self._reload()
+            self._open_log()
+        else:
+            self._read_log()
+
+    # -- state -------------------------------------------------------------
+
+    def _apply(self, record):
+        op = record['op']
+        if op == 'create_user':
+            user = record['user']
+            # First registration wins if two workers raced on the same email
+            if user['email'] not in self._users:
+                self._users[user['email']] = dict(user, chats={})
+        elif op == 'login':
+            if record['email'] in self._users:
+                self._users[record['email']]['last_login'] = record['timestamp']
+        elif op == 'save_chat':
+            if record['email'] in self._users:
+                chat = record['chat']
+                self._users[record['email']]['chats'][chat['id']] = chat
+        elif op == 'delete_chat':
+            if record['email'] in self._users:
+                self._users[record['email']]['chats'].pop(record['chat_id'], None)
+
+    def export_users(self):
+        """Full database in the legacy JSON layout"""
+        with self._lock:
+            return {'users': {
+                email: dict({k: v for k, v in user.items() if k != 'chats'},
+                            chat_history=list(user['chats'].values()))
+                for email, user in self._users.items()
+            }}
+
+    def get_user(self, email):
+        self._refresh()
+        user = self._users.get(email)
+        if user is None:
+            return None
+        return {k: v for k, v in user.items() if k != 'chats'}
+
+    def create_user(self, user):
+        self._refresh()
+        if user['email'] in self._users:
+            return False
+        self._append({'op': 'create_user', 'user': user})
+        return self._users[user['email']]['id'] == user['id']
+
+    def update_last_login(self, email, timestamp):
+        self._append({'op': 'login', 'email': email, 'timestamp': timestamp})
+
+    def add_chat(self, email, chat):
+        self._refresh()
+        if email not in self._users:
+            raise KeyError(email)
+        self._append({'op': 'save_chat', 'email': email, 'chat': chat})
+
+    def list_chats(self, email):
+        self._refresh()
+        user = self._users.get(email)
+        if user is None:
+            return None
+        return list(user['chats'].values())
+
+    def list_chat_summaries(self, email, limit=CHAT_PAGE_SIZE, cursor=None, since=None):
+        self._refresh()
+        user = self._users.get(email)
+        if user is None:
+            return None, None
+        return paginate_summaries(user['chats'].values(), limit, cursor, since)
+
+    def get_chat(self, email, chat_id):
+        self._refresh()
+        user = self._users.get(email)
+        if user is None:
+            return None
+        return user['chats'].get(chat_id)
+
+    def delete_chat(self, email, chat_id):
+        self._refresh()
+        if email not in self._users:
+            return False
+        if chat_id in self._users[email]['chats']:
+            self._append({'op': 'delete_chat', 'email': email, 'chat_id': chat_id})
+        return True
+
+
+#==========================================================================
+# Backend selection
+#==========================================================================
+_store = None
+_store_lock = threading.Lock()
+
+
+def create_user_store(backend=USER_DB_BACKEND):
+    """Build the configured backend"""
+    if backend == 'json':
+        return JSONUserStore(USER_DB_FILE)
+    if backend == 'sqlite':
+        store = SQLiteUserStore(USER_DB_SQLITE)
+        # Pick up accounts from the old JSON database the first time we start
+        if store.is_empty() and os.path.exists(USER_DB_FILE):
+            try:
+                with open(USER_DB_FILE, 'r') as f:
+                    users = json.load(f).get('users', {})
+                user_count, chat_count = store.import_users(users)
+                print(f"Migrated {user_count} users and {chat_count} chats from {USER_DB_FILE}")
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"Could not migrate {USER_DB_FILE}: {str(e)}")
+        return store
+    if backend == 'journal':
+        return JournalUserStore(USER_DB_JOURNAL_DIR, seed_file=USER_DB_FILE)
+    raise ValueError(f"Unknown user database backend: {backend}")
+
+
+def get_user_store():
+    """Return the process-wide user store, creating it on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_user_store()
+    return _store
+
+
+if __name__ == '__main__':
+    # python user_store.py migrate [json_path] [sqlite_path]
+    if len(sys.argv) < 2 or sys.argv[1] != 'migrate':
+        print("Usage: python user_store.py migrate [json_path] [sqlite_path]")
+        sys.exit(1)
+    json_path = sys.argv[2] if len(sys.argv) > 2 else USER_DB_FILE
+    db_path = sys.argv[3] if len(sys.argv) > 3 else USER_DB_SQLITE
+    user_count, chat_count = migrate_json_to_sqlite(json_path, db_path)
+    print(f"Migrated {user_count} users and {chat_count} chats into {db_path}")